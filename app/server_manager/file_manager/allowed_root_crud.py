@@ -1,10 +1,23 @@
-from typing import List, Dict, Any, Optional
+import time
+from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 from crud import add, update, delete, get
+from .utils import root_prefixes
 
 TABLE_NAME = "allowed_roots"
 APP_NAME = "file_explorer"  # matches your DB name
 
+# Allowed roots change rarely; serve them from memory instead of a DB hit per request
+ROOTS_CACHE_TTL = 30  # seconds
+_roots_generation = 0  # bumped on every write so the cache is dropped immediately
+# (cached_at, generation, resolved roots, prefix table for utils.match_root)
+_roots_cache: Optional[Tuple[float, int, List[Path], List[Tuple[str, Path]]]] = None
+
+
+def _invalidate_roots_cache() -> None:
+    global _roots_generation
+    _roots_generation += 1
+
 
 def normalize_path(path: str) -> str:
     """Normalize and validate a filesystem path."""
@@ -26,7 +39,9 @@ def create_allowed_root(
     }
     if description is not None:
         data["description"] = description
-    return add(TABLE_NAME, data, app_name=APP_NAME)
+    root_id = add(TABLE_NAME, data, app_name=APP_NAME)
+    _invalidate_roots_cache()
+    return root_id
 
 
 def get_all_allowed_roots() -> List[Dict[str, Any]]:
@@ -34,10 +49,31 @@ def get_all_allowed_roots() -> List[Dict[str, Any]]:
     return get(TABLE_NAME, app_name=APP_NAME)
 
 
-def get_allowed_roots_as_paths() -> List[Path]:
-    """Helper: Return list of Path objects for current allowed roots."""
+def _load_allowed_roots() -> Tuple[List[Path], List[Tuple[str, Path]]]:
+    """Resolve roots and build their prefix table once per cache refresh, not per call."""
+    global _roots_cache
+    now = time.monotonic()
+    if _roots_cache is not None:
+        cached_at, generation, paths, prefixes = _roots_cache
+        if generation == _roots_generation and now - cached_at < ROOTS_CACHE_TTL:
+            return paths, prefixes
+
+    generation = _roots_generation
     records = get_all_allowed_roots()
-    return [Path(rec["path"]).resolve() for rec in records]
+    paths = [Path(rec["path"]).resolve() for rec in records]
+    prefixes = root_prefixes(paths)
+    _roots_cache = (now, generation, paths, prefixes)
+    return paths, prefixes
+
+
+def get_allowed_roots_as_paths() -> List[Path]:
+    """Helper: Return list of Path objects for current allowed roots (cached for ROOTS_CACHE_TTL)."""
+    return _load_allowed_roots()[0]
+
+
+def get_allowed_root_prefixes() -> List[Tuple[str, Path]]:
+    """Helper: Return (prefix, root) pairs for current allowed roots, for `match_root`."""
+    return _load_allowed_roots()[1]
 
 
 def update_allowed_root(
@@ -55,9 +91,13 @@ def update_allowed_root(
         data["is_allowed"] = is_allowed
     if not data:
         raise ValueError("At least one field must be provided")
-    return update(TABLE_NAME, data, where="id = %s", params=(root_id,), app_name=APP_NAME)
+    rows_updated = update(TABLE_NAME, data, where="id = %s", params=(root_id,), app_name=APP_NAME)
+    _invalidate_roots_cache()
+    return rows_updated
 
 
 def delete_allowed_root(root_id: int) -> int:
     """Delete an allowed root by ID."""
-    return delete(TABLE_NAME, where="id = %s", params=(root_id,), app_name=APP_NAME)
+    rows_deleted = delete(TABLE_NAME, where="id = %s", params=(root_id,), app_name=APP_NAME)
+    _invalidate_roots_cache()
+    return rows_deleted
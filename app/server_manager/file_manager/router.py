@@ -25,7 +25,7 @@ logger = get_router_logger("fileManager")
 # -----------------------
 
 @router.get("/list")
-async def api_list_files(path: str = ""):
+def api_list_files(path: str = ""):
     try:
         items = list_items(path)
         return {"items": items}
@@ -36,7 +36,7 @@ async def api_list_files(path: str = ""):
 
 
 @router.post("/mkdir")
-async def api_create_folder(path: str):
+def api_create_folder(path: str):
     try:
         rel_path = create_folder(path)
         return {"success": True, "path": rel_path}
@@ -47,7 +47,7 @@ async def api_create_folder(path: str):
 
 
 @router.post("/rename")
-async def api_rename_item(path: str, payload: RenamePayload):
+def api_rename_item(path: str, payload: RenamePayload):
     try:
         new_path = rename_item(path, payload.new_name)
         return {"success": True, "new_path": new_path}
@@ -58,7 +58,7 @@ async def api_rename_item(path: str, payload: RenamePayload):
 
 
 @router.delete("/delete")
-async def api_delete_item(path: str):
+def api_delete_item(path: str):
     try:
         delete_item(path)
         return {"success": True}
@@ -69,11 +69,11 @@ async def api_delete_item(path: str):
 
 
 @router.post("/upload/file")
-async def api_upload_file(path: str = "", file: UploadFile = File(...)):
+def api_upload_file(path: str = "", file: UploadFile = File(...)):
     try:
-        content = await file.read()
         filename = file.filename or "uploaded_file"
-        result = upload_file(path, filename, content)
+        # Stream the spooled upload to disk
+        result = upload_file(path, filename, file.file)
         return {"success": True, **result}
     except Exception as e:
         if not isinstance(e, HTTPException):
@@ -82,11 +82,10 @@ async def api_upload_file(path: str = "", file: UploadFile = File(...)):
 
 
 @router.post("/upload/folder")
-async def api_upload_folder_as_zip(path: str = "", zip_file: UploadFile = File(...)):
+def api_upload_folder_as_zip(path: str = "", zip_file: UploadFile = File(...)):
     try:
-        content = await zip_file.read()
         filename = zip_file.filename or "uploaded.zip"
-        folder_path = upload_and_extract_zip(path, content, filename)
+        folder_path = upload_and_extract_zip(path, zip_file.file, filename)
         return {"success": True, "folder_path": folder_path}
     except Exception as e:
         if not isinstance(e, HTTPException):
@@ -95,10 +94,10 @@ async def api_upload_folder_as_zip(path: str = "", zip_file: UploadFile = File(.
 
 
 @router.get("/download/file")
-async def api_download_file(path: str):
+def api_download_file(path: str):
     try:
-        file_path = download_file_path(path)
-        return FileResponse(file_path, filename=file_path.name)
+        file_path, file_stat = download_file_path(path)
+        return FileResponse(file_path, filename=file_path.name, stat_result=file_stat)
     except Exception as e:
         if not isinstance(e, HTTPException):
             logger.error(f"Unexpected error in api_download_file: {e}", exc_info=True)
@@ -106,7 +105,7 @@ async def api_download_file(path: str):
 
 
 @router.get("/download/folder")
-async def api_download_folder_as_zip(path: str):
+def api_download_folder_as_zip(path: str):
     try:
         zip_filename, generator = get_folder_zip_generator(path)
         return StreamingResponse(
@@ -121,7 +120,7 @@ async def api_download_folder_as_zip(path: str):
 
 
 @router.post("/copy")
-async def api_copy_item(path: str, payload: MoveCopyPayload):
+def api_copy_item(path: str, payload: MoveCopyPayload):
     try:
         dest = copy_item(path, payload.destination)
         return {"success": True, "destination": dest}
@@ -132,7 +131,7 @@ async def api_copy_item(path: str, payload: MoveCopyPayload):
 
 
 @router.post("/move")
-async def api_move_item(path: str, payload: MoveCopyPayload):
+def api_move_item(path: str, payload: MoveCopyPayload):
     try:
         dest = move_item(path, payload.destination)
         return {"success": True, "destination": dest}
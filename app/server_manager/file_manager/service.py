@@ -1,21 +1,19 @@
+import os
 import shutil
-import tempfile
 import zipfile
 from pathlib import Path
-from typing import List, Dict, Any, Generator
+from stat import S_ISREG
+from typing import List, Dict, Any, BinaryIO, Generator
 from fastapi import HTTPException
-from .utils import resolve_safe_path, generate_zip_from_folder
+from .utils import resolve_safe_path, generate_zip_from_folder, match_root
 
 # Helper function to determine which root a path belongs to
 def _get_current_root(full_path: Path) -> Path:
-    from .allowed_root_crud import get_allowed_roots_as_paths  # ← add this import
-    for root in get_allowed_roots_as_paths():  # ← call function, not variable
-        try:
-            full_path.relative_to(root)
-            return root
-        except ValueError:
-            continue
-    raise HTTPException(status_code=403, detail="Path not under any allowed root")
+    from .allowed_root_crud import get_allowed_root_prefixes  # ← add this import
+    root = match_root(full_path, get_allowed_root_prefixes())
+    if root is None:
+        raise HTTPException(status_code=403, detail="Path not under any allowed root")
+    return root
 
 # Helper function to get virtual path relative to its root
 def _get_virtual_path(full_path: Path) -> str:
@@ -31,29 +29,28 @@ def list_items(path: str) -> List[Dict[str, Any]]:
         raise HTTPException(status_code=400, detail="Path is not a directory")
 
     current_root = _get_current_root(full_path)
+    # Every entry shares this directory's path relative to the root
+    base = str(full_path.relative_to(current_root))
     items = []
-    
-    for item in full_path.iterdir():
-        is_dir = item.is_dir()
-        stat = item.stat()
-        
-        try:
-            # Get path relative to the current root
-            rel_path = item.relative_to(current_root)
-        except ValueError:
-            # Fallback if path resolution fails unexpectedly
-            rel_path = item.name
-
-        items.append({
-            "name": item.name,
-            "path": str(rel_path),
-            "type": "folder" if is_dir else "file",
-            "size": stat.st_size if not is_dir else None,
-            "modified": stat.st_mtime,
-        })
-    
-    # Sort: folders first, then by name (case-insensitive)
-    return sorted(items, key=lambda x: (x["type"] != "folder", x["name"].lower()))
+
+    # scandir's DirEntry caches the file type and stat from the directory read
+    with os.scandir(full_path) as entries:
+        for entry in entries:
+            is_dir = entry.is_dir()
+            stat = entry.stat()
+
+            items.append({
+                "name": entry.name,
+                "path": entry.name if base == "." else os.path.join(base, entry.name),
+                "type": "folder" if is_dir else "file",
+                "size": stat.st_size if not is_dir else None,
+                "modified": stat.st_mtime,
+            })
+
+    # Sort in place: folders first, then by name (case-insensitive).
+    # The key is computed once per item, not per comparison.
+    items.sort(key=lambda x: (x["type"] != "folder", x["name"].casefold()))
+    return items
 
 
 def create_folder(path: str) -> str:
@@ -87,7 +84,10 @@ def delete_item(path: str) -> None:
         shutil.rmtree(full_path)
 
 
-def upload_file(path: str, filename: str, content: bytes) -> Dict[str, Any]:
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1 MiB
+
+
+def upload_file(path: str, filename: str, source: BinaryIO) -> Dict[str, Any]:
     dir_path = resolve_safe_path(path)
     if not dir_path.is_dir():
         raise HTTPException(status_code=400, detail="Upload path must be a directory")
@@ -96,8 +96,9 @@ def upload_file(path: str, filename: str, content: bytes) -> Dict[str, Any]:
     if file_path.exists():
         raise HTTPException(status_code=409, detail="File already exists")
     
+    # Copy in chunks so memory stays bounded regardless of upload size
     with open(file_path, "wb") as f:
-        f.write(content)
+        shutil.copyfileobj(source, f, UPLOAD_CHUNK_SIZE)
     
     return {
         "file_path": _get_virtual_path(file_path),
@@ -105,7 +106,7 @@ def upload_file(path: str, filename: str, content: bytes) -> Dict[str, Any]:
     }
 
 
-def upload_and_extract_zip(path: str, zip_content: bytes, zip_filename: str) -> str:
+def upload_and_extract_zip(path: str, zip_source: BinaryIO, zip_filename: str) -> str:
     if not zip_filename.endswith(".zip"):
         raise HTTPException(status_code=400, detail="Only ZIP files allowed")
     
@@ -117,26 +118,31 @@ def upload_and_extract_zip(path: str, zip_content: bytes, zip_filename: str) ->
     if extract_to.exists():
         raise HTTPException(status_code=409, detail="Folder already exists")
 
-    with tempfile.TemporaryDirectory() as tmpdir:
-        zip_path = Path(tmpdir) / "upload.zip"
-        zip_path.write_bytes(zip_content)
-        
-        with zipfile.ZipFile(zip_path, 'r') as zf:
-            # Security check: Prevent Zip Slip vulnerability
-            for member in zf.infolist():
-                member_path = (extract_to / member.filename).resolve()
-                if not str(member_path).startswith(str(extract_to.resolve())):
-                    raise HTTPException(status_code=400, detail="Invalid zip file: contains path traversal")
-            zf.extractall(extract_to)
+    # The upload is already spooled to a seekable file, so read the archive in place
+    with zipfile.ZipFile(zip_source, 'r') as zf:
+        # Security check: Prevent Zip Slip vulnerability.
+        # Lexical only - extract_to is a fresh folder, so no member can hit a symlink.
+        root = os.path.realpath(extract_to)
+        root_prefix = root.rstrip(os.sep) + os.sep
+        for member in zf.infolist():
+            member_path = os.path.normpath(os.path.join(root, member.filename))
+            if member_path != root and not member_path.startswith(root_prefix):
+                raise HTTPException(status_code=400, detail="Invalid zip file: contains path traversal")
+        zf.extractall(extract_to)
     
     return _get_virtual_path(extract_to)
 
 
-def download_file_path(path: str) -> Path:
+def download_file_path(path: str) -> tuple[Path, os.stat_result]:
     file_path = resolve_safe_path(path)
-    if not file_path.is_file():
+    # One stat serves both the existence check and FileResponse's headers
+    try:
+        file_stat = file_path.stat()
+    except OSError:
+        raise HTTPException(status_code=404, detail="File not found")
+    if not S_ISREG(file_stat.st_mode):
         raise HTTPException(status_code=404, detail="File not found")
-    return file_path
+    return file_path, file_stat
 
 
 def get_folder_zip_generator(path: str) -> tuple[str, Generator[bytes, None, None]]:
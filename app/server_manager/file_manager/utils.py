@@ -1,13 +1,30 @@
+import io
 import os
 import zipfile
-import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Generator, List
+from typing import Generator, List, Optional, Tuple
 from fastapi import HTTPException
 
+def root_prefixes(roots: List[Path]) -> List[Tuple[str, Path]]:
+    """Pair each root with its string prefix (trailing separator), keeping root order."""
+    return [(str(root).rstrip(os.sep) + os.sep, root) for root in roots]
+
+def match_root(path: Path, prefixes: List[Tuple[str, Path]]) -> Optional[Path]:
+    """
+    Return the first root containing `path`, or None.
+    Purely lexical: a string prefix test instead of Path.relative_to raising on every miss.
+    """
+    # Appending a separator lets one startswith() cover both the root itself and its children
+    path_str = str(path) + os.sep
+    for prefix, root in prefixes:
+        if path_str.startswith(prefix):
+            return root
+    return None
+
 def resolve_safe_path(subpath: str) -> Path:
     # Get REAL allowed roots (resolved via CRUD function)
-    from .allowed_root_crud import get_allowed_roots_as_paths  # adjust import as needed
+    from .allowed_root_crud import get_allowed_roots_as_paths, get_allowed_root_prefixes  # adjust import as needed
     allowed_roots = get_allowed_roots_as_paths()  # Uses imported CRUD function
     if not allowed_roots:
         raise HTTPException(status_code=500, detail="No allowed roots configured")
@@ -15,25 +32,19 @@ def resolve_safe_path(subpath: str) -> Path:
     if not subpath:
         return allowed_roots[0]
 
+    prefixes = get_allowed_root_prefixes()
     input_path = Path(subpath)
 
     # ABSOLUTE PATH HANDLING (your /home case)
     if input_path.is_absolute():
         # DO NOT resolve symlinks yet - validate first
         normalized_input = Path(os.path.normpath(str(input_path)))
-        
-        for root in allowed_roots:
-            # Resolve root ONCE (it's trusted)
-            resolved_root = root.resolve(strict=False)
-            
-            # Critical: Check containment BEFORE resolving input
-            try:
-                # Handles exact root matches AND subdirectories
-                normalized_input.relative_to(resolved_root)
-                # Only NOW resolve the full path (safe because validated)
-                return normalized_input.resolve(strict=False)
-            except ValueError:
-                continue
+
+        # Critical: Check containment BEFORE resolving input
+        # (handles exact root matches AND subdirectories)
+        if match_root(normalized_input, prefixes) is not None:
+            # Only NOW resolve the full path (safe because validated)
+            return normalized_input.resolve(strict=False)
 
         raise HTTPException(status_code=403, detail="Path not under any allowed root")
 
@@ -41,41 +52,83 @@ def resolve_safe_path(subpath: str) -> Path:
     if any(part == ".." for part in input_path.parts):
         raise HTTPException(status_code=400, detail="Path traversal ('..') is not allowed")
 
-    for root in allowed_roots:
+    for prefix, root in prefixes:
         candidate = root / input_path
         try:
             resolved_candidate = candidate.resolve(strict=False)
-            resolved_root = root.resolve(strict=False)
-            resolved_candidate.relative_to(resolved_root)  # Validates containment
-            return resolved_candidate
-        except (ValueError, OSError):
+        except OSError:
             continue
+        # Validates containment (symlinks may still point outside the root)
+        if (str(resolved_candidate) + os.sep).startswith(prefix):
+            return resolved_candidate
 
     raise HTTPException(status_code=403, detail="Path not under any allowed root")
 
 # --- ZIP Streaming Utility ---
 
+ZIP_CHUNK_SIZE = 65536  # 64 KiB
+
+# Already-compressed formats; deflating them burns CPU for ~0% savings
+INCOMPRESSIBLE_EXTENSIONS = frozenset({
+    ".zip", ".gz", ".tgz", ".bz2", ".xz", ".zst", ".7z", ".rar",
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic",
+    ".mp3", ".aac", ".ogg", ".flac", ".m4a",
+    ".mp4", ".mkv", ".mov", ".avi", ".webm",
+    ".pdf", ".docx", ".xlsx", ".pptx", ".jar", ".apk", ".whl",
+})
+
+
+def _zip_compress_type(path: Path) -> int:
+    if path.suffix.lower() in INCOMPRESSIBLE_EXTENSIONS:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+class _ZipStreamSink(io.RawIOBase):
+    """Write-only, non-seekable sink that collects ZIP output until it is drained."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._buffer += b
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
 def generate_zip_from_folder(folder_path: Path) -> Generator[bytes, None, None]:
-    """Stream a ZIP archive of the given folder."""
+    """Stream a ZIP archive of the given folder without staging it on disk."""
     if not folder_path.exists() or not folder_path.is_dir():
         raise HTTPException(status_code=404, detail=f"Folder not found: {folder_path}")
 
-    with tempfile.NamedTemporaryFile(delete=False) as tmp:
-        tmp_name = tmp.name
-
-    try:
-        with zipfile.ZipFile(tmp_name, 'w', zipfile.ZIP_DEFLATED) as zf:
-            for root_dir, _, files in os.walk(folder_path):
-                for fname in files:
-                    full_path = Path(root_dir) / fname
-                    arcname = full_path.relative_to(folder_path)
-                    zf.write(full_path, arcname)
-
-        with open(tmp_name, "rb") as f:
-            while chunk := f.read(65536):  # 64 KiB chunks
-                yield chunk
-    finally:
-        try:
-            os.unlink(tmp_name)
-        except OSError:
-            pass
\ No newline at end of file
+    sink = _ZipStreamSink()
+    # The sink can't seek, so zipfile writes data descriptors after each entry.
+    # A reader thread fetches the next chunk while this one is deflated
+    # (zlib releases the GIL), overlapping disk I/O with compression.
+    with ThreadPoolExecutor(max_workers=1) as reader, \
+            zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for root_dir, _, files in os.walk(folder_path):
+            for fname in files:
+                full_path = Path(root_dir) / fname
+                zinfo = zipfile.ZipInfo.from_file(full_path, full_path.relative_to(folder_path))
+                zinfo.compress_type = _zip_compress_type(full_path)
+                with open(full_path, "rb") as src, zf.open(zinfo, "w") as dest:
+                    pending = reader.submit(src.read, ZIP_CHUNK_SIZE)
+                    while chunk := pending.result():
+                        pending = reader.submit(src.read, ZIP_CHUNK_SIZE)
+                        dest.write(chunk)
+                        if data := sink.drain():
+                            yield data
+                if data := sink.drain():
+                    yield data
+
+    # Central directory is written when the archive closes
+    if data := sink.drain():
+        yield data
@@ -1,43 +1,92 @@
 import asyncio
-import json
+import threading
+import time
 from fastapi import WebSocket, WebSocketDisconnect
+import msgpack
+import orjson
 import psutil
 
+from utils.router_logger import get_router_logger
+
+logger = get_router_logger("hardware_ws")
+
+# Connected clients per metric, mapped to (negotiated encoding, outgoing queue)
 clients = {
-    "cpu": set(),
-    "memory": set(),
-    "disk": set(),
-    "network": set()
+    "cpu": {},
+    "memory": {},
+    "disk": {},
+    "network": {}
+}
+
+MSGPACK_SUBPROTOCOL = "msgpack"
+
+# Per-client backlog; metrics are lossy so the oldest sample is dropped when full
+CLIENT_QUEUE_SIZE = 8
+
+ENCODERS = {
+    "json": orjson.dumps,
+    "msgpack": lambda data: msgpack.packb(data, use_bin_type=True),
+}
+
+# Polling interval (seconds) per metric; disk usage changes slowly
+INTERVALS = {
+    "cpu": 1,
+    "memory": 5,
+    "disk": 10,
+    "network": 1,
 }
 
+# Base tick of the poller thread; every interval above is a multiple of it
+POLL_TICK = 1
+
+# Last published sample per metric and its encodings; reused while unchanged
+_payload_cache = {}
+_poller = None
+
+# CPU frequency bounds don't change at runtime, so read them once
+_initial_freq = psutil.cpu_freq()
+_CPU_FREQ_MAX = _initial_freq.max if _initial_freq else 0
+_CPU_FREQ_MIN = _initial_freq.min if _initial_freq else 0
+
+# coretemp doesn't move faster than this, so cache the sysfs read briefly
+TEMP_CACHE_TTL = 2
+_last_temps = None
+_last_temps_time = 0.0
+
 # -----------------------
 # Metric functions
 # -----------------------
-async def get_cpu_metrics():
+def _get_temperatures():
+    global _last_temps, _last_temps_time
+    now = time.monotonic()
+    if _last_temps is None or now - _last_temps_time >= TEMP_CACHE_TTL:
+        _last_temps = psutil.sensors_temperatures()
+        _last_temps_time = now
+    return _last_temps
+
+def get_cpu_metrics():
     freq = psutil.cpu_freq()
-    cpu_max = freq.max if freq else 0
     cpu_current = freq.current if freq else 0
-    cpu_min = freq.min if freq else 0
 
-    temps = psutil.sensors_temperatures()
-    temp_values = [t.current for t in temps.get("coretemp", [])]
-    temp_max = max(temp_values) if temp_values else 0
-    temp_min = min(temp_values) if temp_values else 0
-    temp_current = sum(temp_values)/len(temp_values) if temp_values else 0
+    temps = _get_temperatures()
+    # Only the average is reported, so a single sum over the sensors is enough
+    core_temps = temps.get("coretemp", [])
+    temp_current = sum(t.current for t in core_temps) / len(core_temps) if core_temps else 0
 
     return {
-        "freq": {"max": cpu_max, "used": cpu_current, "min": cpu_min},
+        "freq": {"max": _CPU_FREQ_MAX, "used": cpu_current, "min": _CPU_FREQ_MIN},
         "temp": temp_current
     }
 
-async def get_memory_metrics():
+def get_memory_metrics():
     mem = psutil.virtual_memory()
+    swap = psutil.swap_memory()
     return {
         "memory": {"max": mem.total, "used": mem.used, "min": mem.available},
-        "swap": {"max": psutil.swap_memory().total, "used": psutil.swap_memory().used, "min": psutil.swap_memory().free}
+        "swap": {"max": swap.total, "used": swap.used, "min": swap.free}
     }
 
-async def get_disk_metrics():
+def get_disk_metrics():
     partitions = psutil.disk_partitions()
     disks = []
     for p in partitions:
@@ -54,50 +103,133 @@ async def get_disk_metrics():
             continue
     return disks  # Each disk has total/used/free (raw numbers)
 
-async def get_network_metrics():
+def get_network_metrics():
     net_io = psutil.net_io_counters()
     return {
         "network": {"sent": net_io.bytes_sent, "recv": net_io.bytes_recv}
     }
 
+METRIC_FUNCTIONS = {
+    "cpu": get_cpu_metrics,
+    "memory": get_memory_metrics,
+    "disk": get_disk_metrics,
+    "network": get_network_metrics,
+}
+
 # -----------------------
-# Broadcast loop
+# Poller thread
 # -----------------------
-async def broadcast(metric_name, get_metric_fn):
-    while True:
-        if clients[metric_name]:
-            data = await get_metric_fn()
-            message = json.dumps(data)
-            disconnected = set()
-            for ws in clients[metric_name]:
+class _PollerThread(threading.Thread):
+    """Samples every metric on its own interval from one thread and hands each sample to the event loop."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        super().__init__(name="hardware-poller", daemon=True)
+        self._loop = loop
+        self._stop_event = threading.Event()
+
+    def run(self):
+        next_due = dict.fromkeys(METRIC_FUNCTIONS, 0.0)
+        next_tick = time.monotonic()
+        while not self._stop_event.is_set():
+            for metric_name, get_metric_fn in METRIC_FUNCTIONS.items():
+                # Nobody listening or not due yet: skip the psutil call entirely.
+                # Due times sit on the tick grid, so compare the tick rather than
+                # the wake-up time, which jitters
+                if not clients[metric_name] or next_tick < next_due[metric_name]:
+                    continue
+                try:
+                    data = get_metric_fn()
+                except Exception:
+                    # Keep the poller alive; retry on the next tick
+                    logger.exception("[%s] Failed to sample metric", metric_name.upper())
+                    continue
                 try:
-                    await ws.send_text(message)
-                except:
-                    disconnected.add(ws)
-            clients[metric_name].difference_update(disconnected)
-        await asyncio.sleep(1)
+                    asyncio.run_coroutine_threadsafe(publish(metric_name, data), self._loop)
+                except RuntimeError:  # event loop closed: the app is shutting down
+                    return
+                next_due[metric_name] = next_tick + INTERVALS[metric_name]
+
+            # Wait until the next absolute tick so the sampling period doesn't drift
+            next_tick = max(next_tick + POLL_TICK, time.monotonic())
+            self._stop_event.wait(next_tick - time.monotonic())
+
+    def stop(self):
+        self._stop_event.set()
+
+# -----------------------
+# Broadcast
+# -----------------------
+async def publish(metric_name, data):
+    """Fan one fresh sample out to every client of `metric_name`; the only writer to client queues."""
+    cached = _payload_cache.get(metric_name)
+    if cached is None or cached[0] != data:
+        cached = _payload_cache[metric_name] = (data, {})
+    payloads = cached[1]
+
+    # Encode once per encoding; clients sharing one get the same bytes
+    for encoding, queue in clients[metric_name].values():
+        payload = payloads.get(encoding)
+        if payload is None:
+            payload = payloads[encoding] = ENCODERS[encoding](data)
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(payload)
+
+async def _drain(websocket: WebSocket, queue: asyncio.Queue, metric_name: str):
+    """Send queued payloads to a single client until it goes away."""
+    try:
+        while True:
+            payload = await queue.get()
+            # A client that fell behind only needs the newest sample: collapse
+            # the backlog into one frame instead of replaying stale ones
+            while not queue.empty():
+                payload = queue.get_nowait()
+            await websocket.send_bytes(payload)
+    except Exception:
+        clients[metric_name].pop(websocket, None)
 
 # -----------------------
 # WebSocket handler
 # -----------------------
 async def websocket_endpoint(websocket: WebSocket, metric_name: str):
-    await websocket.accept()
-    clients[metric_name].add(websocket)
-    print(f"[{metric_name.upper()}] Client connected")
+    # Clients asking for the "msgpack" subprotocol get MessagePack frames, others JSON
+    if MSGPACK_SUBPROTOCOL in websocket.scope.get("subprotocols", []):
+        await websocket.accept(subprotocol=MSGPACK_SUBPROTOCOL)
+        encoding = "msgpack"
+    else:
+        await websocket.accept()
+        encoding = "json"
+
+    queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+    clients[metric_name][websocket] = (encoding, queue)
+    # Start from the latest sample instead of waiting up to a full interval
+    cached = _payload_cache.get(metric_name)
+    if cached is not None:
+        data, payloads = cached
+        payload = payloads.get(encoding)
+        if payload is None:
+            payload = payloads[encoding] = ENCODERS[encoding](data)
+        queue.put_nowait(payload)
+    writer = asyncio.create_task(_drain(websocket, queue, metric_name))
+    logger.info("[%s] Client connected", metric_name.upper())
     try:
+        # Park until the client sends something or goes away; no idle wakeups
         while True:
-            await asyncio.sleep(10)
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
     except WebSocketDisconnect:
         pass
     finally:
-        clients[metric_name].remove(websocket)
-        print(f"[{metric_name.upper()}] Client disconnected")
+        clients[metric_name].pop(websocket, None)
+        writer.cancel()
+        logger.info("[%s] Client disconnected", metric_name.upper())
 
 # -----------------------
-# Startup to launch all broadcasters
+# Startup: launch the poller
 # -----------------------
 def start_broadcasts():
-    asyncio.create_task(broadcast("cpu", get_cpu_metrics))
-    asyncio.create_task(broadcast("memory", get_memory_metrics))
-    asyncio.create_task(broadcast("disk", get_disk_metrics))
-    asyncio.create_task(broadcast("network", get_network_metrics))
+    global _poller
+    if _poller is None:
+        _poller = _PollerThread(asyncio.get_running_loop())
+        _poller.start()
@@ -1,33 +1,39 @@
-from fastapi import APIRouter, HTTPException, Request, Depends
+from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from typing import Optional
-from crud import add, update, delete, get
+from crud import update, delete, make_getter, make_inserter
+from db import make_db_conn
 from datetime import datetime
-import sys
-import subprocess
 import socket
+import time
+import psutil
 
-from utils.router_logger import get_router_logger
+from utils.errors import make_router_error_logger
 
-router = APIRouter()
 APP_NAME = "portManager"
 
-logger = get_router_logger(APP_NAME)
+log_router_errors = make_router_error_logger(APP_NAME)
+router = APIRouter(dependencies=[Depends(log_router_errors)])
+db_conn = make_db_conn(APP_NAME)
 
-# -----------------------
-# Error logging dependency
-# -----------------------
-async def log_router_errors(request: Request):
-    try:
-        yield
-    except Exception as exc:
-        logger.error(
-            f"{request.method} {request.url.path} | {exc}",
-            exc_info=True
-        )
-        raise
+list_ports = make_getter("ports", app_name=APP_NAME)
+get_port = make_getter("ports", where="id=%s", app_name=APP_NAME)
+insert_port = make_inserter("ports", ["name", "http_port", "https_port", "created_at"], app_name=APP_NAME)
+
+# Snapshot of the kernel's socket table, reused for repeated port checks
+CONNECTIONS_CACHE_TTL = 0.5  # seconds
+_connections_cache = (0.0, [])
 
 
+def _get_tcp_connections():
+    global _connections_cache
+    cached_at, connections = _connections_cache
+    now = time.monotonic()
+    if now - cached_at >= CONNECTIONS_CACHE_TTL:
+        connections = psutil.net_connections(kind="tcp")
+        _connections_cache = (now, connections)
+    return connections
+
 # -----------------------
 # Schemas
 # -----------------------
@@ -47,9 +53,9 @@ class PortUpdate(BaseModel):
 # PORTS CRUD
 # -----------------------
 
-@router.get("/ports", dependencies=[Depends(log_router_errors)])
-async def get_ports():
-    rows = get("ports", app_name=APP_NAME, limit=None)
+@router.get("/ports")
+def get_ports():
+    rows = list_ports()
     return [
         {
             "id": r["id"],
@@ -62,26 +68,22 @@ async def get_ports():
     ] if rows else []
 
 
-@router.post("/ports", status_code=201, dependencies=[Depends(log_router_errors)])
-async def create_port(port: PortCreate):
+@router.post("/ports", status_code=201)
+def create_port(port: PortCreate):
     if not (1 <= port.http_port <= 65535):
         raise HTTPException(status_code=400, detail="Invalid HTTP port")
 
     if port.https_port is not None and not (1 <= port.https_port <= 65535):
         raise HTTPException(status_code=400, detail="Invalid HTTPS port")
 
-    created_at = datetime.utcnow().isoformat()
+    created_at = datetime.utcnow()
 
-    port_id = add(
-        "ports",
-        {
-            "name": port.name,
-            "http_port": port.http_port,
-            "https_port": port.https_port,
-            "created_at": created_at,
-        },
-        app_name=APP_NAME,
-    )
+    port_id = insert_port({
+        "name": port.name,
+        "http_port": port.http_port,
+        "https_port": port.https_port,
+        "created_at": created_at,
+    })
 
     return {
         "id": port_id,
@@ -92,14 +94,9 @@ async def create_port(port: PortCreate):
     }
 
 
-@router.put("/ports/{port_id}", dependencies=[Depends(log_router_errors)])
-async def update_port(port_id: int, port: PortUpdate):
-    existing = get(
-        "ports",
-        where="id=%s",
-        params=(port_id,),
-        app_name=APP_NAME,
-    )
+@router.put("/ports/{port_id}")
+def update_port(port_id: int, port: PortUpdate, conn=Depends(db_conn)):
+    existing = get_port((port_id,), conn=conn)
 
     if not existing:
         raise HTTPException(status_code=404, detail="Port not found")
@@ -124,6 +121,7 @@ async def update_port(port_id: int, port: PortUpdate):
         where="id=%s",
         params=(port_id,),
         app_name=APP_NAME,
+        conn=conn,
     )
 
     return {
@@ -132,72 +130,46 @@ async def update_port(port_id: int, port: PortUpdate):
     }
 
 
-@router.delete("/ports/{port_id}", dependencies=[Depends(log_router_errors)])
-async def delete_port(port_id: int):
-    existing = get(
+@router.delete("/ports/{port_id}")
+def delete_port(port_id: int):
+    # Single round trip: a missing row shows up as zero rows deleted
+    rows_deleted = delete(
         "ports",
-        columns=["id"],
         where="id=%s",
         params=(port_id,),
         app_name=APP_NAME,
     )
 
-    if not existing:
+    if not rows_deleted:
         raise HTTPException(status_code=404, detail="Port not found")
 
-    rows_deleted = delete(
-        "ports",
-        where="id=%s",
-        params=(port_id,),
-        app_name=APP_NAME,
-    )
-
-    return {"success": rows_deleted > 0}
+    return {"success": True}
 
 
-@router.get("/check-port/{port}", dependencies=[Depends(log_router_errors)])
-async def check_port(port: int):
+@router.get("/check-port/{port}")
+def check_port(port: int):
     if port <= 0 or port > 65535:
         raise HTTPException(status_code=400, detail="Invalid port")
 
-    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    s.settimeout(1)
-
+    # One scan of the TCP socket table (IPv4 + IPv6, every interface) answers both
+    # "is anything listening?" and "who?", without binding a probe socket
     try:
-        s.bind(("127.0.0.1", port))
-        s.close()
-        return {"available": True}
-
-    except OSError:
-        used_by = "Unknown process"
-
-        try:
-            if sys.platform.startswith("win"):
-                cmd = f'netstat -ano | findstr :{port}'
-                output = subprocess.check_output(cmd, shell=True, text=True)
-                pid = output.strip().split()[-1]
-
-                name_cmd = f'tasklist /FI "PID eq {pid}" /FO CSV /NH'
-                name_out = subprocess.check_output(name_cmd, shell=True, text=True)
-                used_by = name_out.split(',')[0].replace('"', '') + f" (PID {pid})"
-
-            else:
-                pid = subprocess.check_output(
-                    f"lsof -i :{port} -t",
-                    shell=True,
-                    text=True
-                ).strip()
-
-                name = subprocess.check_output(
-                    f"ps -p {pid} -o comm=",
-                    shell=True,
-                    text=True
-                ).strip()
-
-                used_by = f"{name} (PID {pid})"
-
-        except Exception:
-            # Any failure here is logged automatically
-            pass
-
-        return {"available": False, "usedBy": used_by}
+        connections = _get_tcp_connections()
+    except psutil.AccessDenied:
+        # Socket table not readable here: fall back to probing loopback
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            s.settimeout(0.5)
+            in_use = s.connect_ex(("127.0.0.1", port)) == 0
+        return {"available": False, "usedBy": "Unknown process"} if in_use else {"available": True}
+
+    for conn in connections:
+        if conn.status == psutil.CONN_LISTEN and conn.laddr and conn.laddr.port == port:
+            used_by = "Unknown process"
+            if conn.pid:
+                try:
+                    used_by = f"{psutil.Process(conn.pid).name()} (PID {conn.pid})"
+                except psutil.Error:
+                    pass
+            return {"available": False, "usedBy": used_by}
+
+    return {"available": True}
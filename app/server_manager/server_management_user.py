@@ -1,25 +1,28 @@
-from fastapi import APIRouter, HTTPException, Query, Request, Depends
+from fastapi import APIRouter, HTTPException, Query, Depends
 from pydantic import BaseModel, EmailStr
 from typing import Optional, List
 from datetime import datetime
-from crud import add, get, update, delete
-from utils.router_logger import get_router_logger
+from crud import add, get, update, delete, make_getter
+from db import make_db_conn
+from utils.errors import make_router_error_logger
 import bcrypt
+import os
 import uuid
 
-router = APIRouter()
 APP_NAME = "server_management"
-logger = get_router_logger(APP_NAME)
+log_router_errors = make_router_error_logger(APP_NAME)
+router = APIRouter(dependencies=[Depends(log_router_errors)])
+db_conn = make_db_conn(APP_NAME)
+
+get_user_by_email = make_getter("User", where="email=%s", app_name=APP_NAME)
+get_user_by_id = make_getter("User", where="id=%s", app_name=APP_NAME)
+
+# bcrypt cost factor; tune per deployment (each +1 doubles hashing time)
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
 
-# -----------------------
-# Error logging dependency
-# -----------------------
-async def log_router_errors(request: Request):
-    try:
-        yield
-    except Exception as exc:
-        logger.error(f"{request.method} {request.url.path} | {exc}", exc_info=True)
-        raise
+
+def _hash_password(password: str) -> str:
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(BCRYPT_ROUNDS)).decode()
 
 # -----------------------
 # Schemas
@@ -47,7 +50,7 @@ class UserOut(BaseModel):
 # -----------------------
 ROLES = ["ADMIN", "USER"]
 
-@router.get("/roles", dependencies=[Depends(log_router_errors)])
+@router.get("/roles")
 async def get_roles():
     return ROLES
 
@@ -55,8 +58,8 @@ async def get_roles():
 # USERS CRUD
 # -----------------------
 
-@router.get("/users", response_model=List[UserOut], dependencies=[Depends(log_router_errors)])
-async def get_users(
+@router.get("/users", response_model=List[UserOut])
+def get_users(
     name: Optional[str] = Query(None),
     email: Optional[str] = Query(None),
     role: Optional[str] = Query(None)
@@ -64,49 +67,58 @@ async def get_users(
     """
     Fetch users filtered by name, email, or role. 
     If no filters are provided, returns all users.
+    Filtering happens in SQL so only matching rows leave the database.
     """
-    # Fetch all users
-    rows = get("User", app_name=APP_NAME, limit=None)
-
-    if not rows:
-        return []
-
-    # Filter rows based on query params
-    filtered = []
-    for r in rows:
-        if name and name.lower() not in (r.get("name") or "").lower():
-            continue
-        if email and email.lower() != r.get("email", "").lower():
-            continue
-        if role and role.upper() != r.get("role", "USER").upper():
-            continue
-        filtered.append({
+    conditions = []
+    params = []
+    if name:
+        # Case-insensitive substring match; escape LIKE wildcards in the input
+        escaped = name.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        conditions.append("LOWER(name) LIKE %s")
+        params.append(f"%{escaped}%")
+    if email:
+        conditions.append("LOWER(email) = %s")
+        params.append(email.lower())
+    if role:
+        conditions.append("UPPER(role) = %s")
+        params.append(role.upper())
+
+    rows = get(
+        "User",
+        where=" AND ".join(conditions) or None,
+        params=tuple(params),
+        app_name=APP_NAME,
+        limit=None,
+    )
+
+    return [
+        {
             "id": r["id"],
             "name": r.get("name"),
             "email": r["email"],
             "role": r.get("role", "USER"),
             "createdAt": r["createdAt"],
-        })
+        }
+        for r in rows
+    ]
 
-    return filtered
-
-@router.post("/users", response_model=UserOut, status_code=201, dependencies=[Depends(log_router_errors)])
-async def create_user(user: UserCreate):
+@router.post("/users", response_model=UserOut, status_code=201)
+def create_user(user: UserCreate, conn=Depends(db_conn)):
     # Validate role
     if user.role.upper() not in ROLES:
         raise HTTPException(status_code=400, detail=f"Role must be one of {ROLES}")
 
     # Check if user exists
-    existing = get("User", where="email=%s", params=(user.email,), app_name=APP_NAME)
+    existing = get_user_by_email((user.email,), conn=conn)
     if existing:
         raise HTTPException(status_code=400, detail="User with this email already exists")
 
     # Hash password
-    hashed_password = bcrypt.hashpw(user.password.encode(), bcrypt.gensalt()).decode()
+    hashed_password = _hash_password(user.password)
 
     # Generate UUID for id
     user_id = str(uuid.uuid4())
-    createdAt = datetime.utcnow().isoformat()
+    createdAt = datetime.utcnow()
 
     add(
         "User",
@@ -119,6 +131,7 @@ async def create_user(user: UserCreate):
             "createdAt": createdAt,
         },
         app_name=APP_NAME,
+        conn=conn,
     )
 
     return {
@@ -130,9 +143,9 @@ async def create_user(user: UserCreate):
     }
 
 
-@router.put("/users/{user_id}", response_model=UserOut, dependencies=[Depends(log_router_errors)])
-async def update_user(user_id: str, user: UserUpdate):
-    existing = get("User", where="id=%s", params=(user_id,), app_name=APP_NAME)
+@router.put("/users/{user_id}", response_model=UserOut)
+def update_user(user_id: str, user: UserUpdate, conn=Depends(db_conn)):
+    existing = get_user_by_id((user_id,), conn=conn)
     if not existing:
         raise HTTPException(status_code=404, detail="User not found")
     existing = existing[0]
@@ -144,19 +157,18 @@ async def update_user(user_id: str, user: UserUpdate):
     updated_data = {
         "name": user.name or existing.get("name"),
         "role": updated_role,
-        "password": bcrypt.hashpw(user.password.encode(), bcrypt.gensalt()).decode() if user.password else existing.get("password"),
+        "password": _hash_password(user.password) if user.password else existing.get("password"),
     }
 
-    rows_updated = update("User", updated_data, where="id=%s", params=(user_id,), app_name=APP_NAME)
+    rows_updated = update("User", updated_data, where="id=%s", params=(user_id,), app_name=APP_NAME, conn=conn)
 
     return {**existing, **updated_data}
 
-@router.delete("/users/{user_id}", dependencies=[Depends(log_router_errors)])
-async def delete_user(user_id: str):
-    existing = get("User", where="id=%s", params=(user_id,), app_name=APP_NAME)
-    if not existing:
-        raise HTTPException(status_code=404, detail="User not found")
-
+@router.delete("/users/{user_id}")
+def delete_user(user_id: str):
+    # Single round trip: a missing row shows up as zero rows deleted
     rows_deleted = delete("User", where="id=%s", params=(user_id,), app_name=APP_NAME)
+    if not rows_deleted:
+        raise HTTPException(status_code=404, detail="User not found")
 
-    return {"success": rows_deleted > 0}
\ No newline at end of file
+    return {"success": True}
\ No newline at end of file
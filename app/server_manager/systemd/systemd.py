@@ -1,16 +1,23 @@
 # systemd_routes.py
 import getpass
-from fastapi import APIRouter, HTTPException, Request, Depends
+from fastapi import APIRouter, HTTPException, Depends
 from typing import Optional
 
-from crud import add, update, delete, get
+from crud import add, update, delete, make_getter
+from db import make_db_conn
+from utils.errors import make_router_error_logger
 from utils.router_logger import get_router_logger
 from .utils import (
     run,
     service_file,
     reload_systemd,
     validate_exec_start,
+    update_unit_file,
+    write_unit_file,
     get_service_active_state,
+    get_service_active_states,
+    invalidate_service_state,
+    SERVICE_NAMES,
     ServiceCreate,
     ServiceUpdate,
     SYSTEMD_DIR,
@@ -21,34 +28,23 @@ from .utils import (
 # -----------------------
 # Router setup
 # -----------------------
-router = APIRouter()
 APP_NAME = "systemdManager"
+log_router_errors = make_router_error_logger(APP_NAME)
 logger = get_router_logger(APP_NAME)
+router = APIRouter(dependencies=[Depends(log_router_errors)])
+db_conn = make_db_conn(APP_NAME)
 
-CURRENT_USER = getpass.getuser()
-
+list_service_rows = make_getter("systemd_services", app_name=APP_NAME)
+get_service_row = make_getter("systemd_services", where="id = %s", app_name=APP_NAME)
 
-# -----------------------
-# Error logging dependency
-# -----------------------
-async def log_router_errors(request: Request):
-    try:
-        yield
-    except Exception as exc:
-        logger.error(f"{request.method} {request.url.path} | {exc}", exc_info=True)
-        raise
+CURRENT_USER = getpass.getuser()
 
 
 # -----------------------
 # Database helper (router-specific)
 # -----------------------
-def get_service_or_404(service_id: int) -> dict:
-    rows = get(
-        table="systemd_services",
-        where="id = %s",
-        params=(service_id,),
-        app_name=APP_NAME
-    )
+def get_service_or_404(service_id: int, conn=None) -> dict:
+    rows = get_service_row((service_id,), conn=conn)
     if not rows:
         raise HTTPException(404, "Service not found")
     return rows[0]
@@ -57,8 +53,8 @@ def get_service_or_404(service_id: int) -> dict:
 # -----------------------
 # CRUD Endpoints
 # -----------------------
-@router.post("/services", status_code=201, dependencies=[Depends(log_router_errors)])
-async def create_service(service: ServiceCreate):
+@router.post("/services", status_code=201)
+def create_service(service: ServiceCreate):
     path = service_file(service.name)
     if path.exists():
         raise HTTPException(409, "Service already exists")
@@ -80,50 +76,63 @@ async def create_service(service: ServiceCreate):
 
     content.extend(["", "[Install]", "WantedBy=multi-user.target", ""])
 
-    path.write_text("\n".join(content))
-    reload_systemd()
-
-    add(
-        table="systemd_services",
-        data={
-            "name": service.name,
-            "description": service.description,
-            "exec_start": service.exec_start,
-            "user": CURRENT_USER,
-            "working_directory": service.working_directory,
-            "restart_policy": service.restart,
-            "enabled": False,
-        },
-        app_name=APP_NAME
-    )
+    # Don't leave a unit on disk that the API has no record of
+    try:
+        write_unit_file(path, "\n".join(content))
+        reload_systemd()
+        add(
+            table="systemd_services",
+            data={
+                "name": service.name,
+                "description": service.description,
+                "exec_start": service.exec_start,
+                "user": CURRENT_USER,
+                "working_directory": service.working_directory,
+                "restart_policy": service.restart,
+                "enabled": False,
+            },
+            app_name=APP_NAME
+        )
+    except Exception:
+        path.unlink(missing_ok=True)
+        try:
+            reload_systemd()
+        except Exception:
+            # Re-raise the original failure, not the rollback's
+            logger.exception("daemon-reload failed while rolling back %s", service.name)
+        raise
 
     return {"success": True, "service": service.name}
 
 
-@router.put("/services/{service_id}", dependencies=[Depends(log_router_errors)])
-async def update_service(service_id: int, service: ServiceUpdate):
-    saved = get_service_or_404(service_id)
+@router.put("/services/{service_id}")
+def update_service(service_id: int, service: ServiceUpdate, conn=Depends(db_conn)):
+    saved = get_service_or_404(service_id, conn)
     path = service_file(saved["name"])
 
     if service.exec_start is not None:
         validate_exec_start(service.exec_start)
 
-    lines = path.read_text().splitlines()
-    updated = []
-
-    for line in lines:
-        if service.description is not None and line.startswith("Description="):
-            line = f"Description={service.description}"
-        elif service.exec_start is not None and line.startswith("ExecStart="):
-            line = f"ExecStart={service.exec_start}"
-        elif service.restart is not None and line.startswith("Restart="):
-            line = f"Restart={service.restart}"
-        elif service.working_directory is not None and line.startswith("WorkingDirectory="):
-            line = f"WorkingDirectory={service.working_directory}"
-        updated.append(line)
-
-    path.write_text("\n".join(updated))
-    reload_systemd()
+    changes = {
+        "Unit": {"Description": service.description},
+        "Service": {
+            "ExecStart": service.exec_start,
+            "Restart": service.restart,
+            "WorkingDirectory": service.working_directory,
+        },
+    }
+    changes = {
+        section: {k: v for k, v in values.items() if v is not None}
+        for section, values in changes.items()
+    }
+
+    current = path.read_text()
+    updated = update_unit_file(current, changes)
+
+    # Skip the write and daemon-reload when nothing actually changed
+    if updated != current:
+        write_unit_file(path, updated)
+        reload_systemd()
 
     data = {k: v for k, v in {
         "description": service.description,
@@ -138,19 +147,21 @@ async def update_service(service_id: int, service: ServiceUpdate):
             data=data,
             where="id = %s",
             params=(service_id,),
-            app_name=APP_NAME
+            app_name=APP_NAME,
+            conn=conn,
         )
 
     return {"success": True, "service": saved["name"]}
 
 
-@router.delete("/services/{service_id}", dependencies=[Depends(log_router_errors)])
-async def delete_service(service_id: int):
-    service = get_service_or_404(service_id)
+@router.delete("/services/{service_id}")
+def delete_service(service_id: int, conn=Depends(db_conn)):
+    service = get_service_or_404(service_id, conn)
     path = service_file(service["name"])
 
     run(["systemctl", "stop", service["name"]])
     run(["systemctl", "disable", service["name"]])
+    invalidate_service_state(service["name"])
 
     if path.exists():
         path.unlink()
@@ -161,8 +172,10 @@ async def delete_service(service_id: int):
         table="systemd_services",
         where="id = %s",
         params=(service_id,),
-        app_name=APP_NAME
+        app_name=APP_NAME,
+        conn=conn,
     )
+    SERVICE_NAMES.pop(service_id, None)
 
     return {"success": True, "service": service["name"]}
 
@@ -171,50 +184,55 @@ async def delete_service(service_id: int):
 # Control Endpoints
 # -----------------------
 @router.post("/services/{service_id}/start")
-async def start_service(service_id: int):
+def start_service(service_id: int):
     service = get_service_or_404(service_id)
     run(["systemctl", "start", service["name"]])
+    invalidate_service_state(service["name"])
     return {"status": "started", "service": service["name"]}
 
 
 @router.post("/services/{service_id}/stop")
-async def stop_service(service_id: int):
+def stop_service(service_id: int):
     service = get_service_or_404(service_id)
     run(["systemctl", "stop", service["name"]])
+    invalidate_service_state(service["name"])
     return {"status": "stopped", "service": service["name"]}
 
 
 @router.post("/services/{service_id}/restart")
-async def restart_service(service_id: int):
+def restart_service(service_id: int):
     service = get_service_or_404(service_id)
     run(["systemctl", "restart", service["name"]])
+    invalidate_service_state(service["name"])
     return {"status": "restarted", "service": service["name"]}
 
 
 @router.post("/services/{service_id}/enable")
-async def enable_service(service_id: int):
-    service = get_service_or_404(service_id)
+def enable_service(service_id: int, conn=Depends(db_conn)):
+    service = get_service_or_404(service_id, conn)
     run(["systemctl", "enable", service["name"]])
     update(
         table="systemd_services",
         data={"enabled": True},
         where="id = %s",
         params=(service_id,),
-        app_name=APP_NAME
+        app_name=APP_NAME,
+        conn=conn,
     )
     return {"status": "enabled", "service": service["name"]}
 
 
 @router.post("/services/{service_id}/disable")
-async def disable_service(service_id: int):
-    service = get_service_or_404(service_id)
+def disable_service(service_id: int, conn=Depends(db_conn)):
+    service = get_service_or_404(service_id, conn)
     run(["systemctl", "disable", service["name"]])
     update(
         table="systemd_services",
         data={"enabled": False},
         where="id = %s",
         params=(service_id,),
-        app_name=APP_NAME
+        app_name=APP_NAME,
+        conn=conn,
     )
     return {"status": "disabled", "service": service["name"]}
 
@@ -223,14 +241,14 @@ async def disable_service(service_id: int):
 # Status & Logs
 # -----------------------
 @router.get("/services/{service_id}/status")
-async def service_status(service_id: int):
+def service_status(service_id: int):
     service = get_service_or_404(service_id)
     output = run(["systemctl", "status", service["name"], "--no-pager"])
     return {"service": service["name"], "status": output}
 
 
 @router.get("/services/{service_id}/logs")
-async def service_logs(
+def service_logs(
     service_id: int,
     lines: int = 100,
     since: Optional[str] = None,
@@ -259,7 +277,7 @@ async def service_logs(
     }
 
 @router.get("/services/{service_id}/isrunning")
-async def is_service_running(service_id: int):
+def is_service_running(service_id: int):
     service = get_service_or_404(service_id)
     active_state = get_service_active_state(service["name"])
     is_running = active_state == "active"
@@ -269,10 +287,9 @@ async def is_service_running(service_id: int):
 # List all services
 # -----------------------
 @router.get("/services")
-async def list_services():
-    services = get(table="systemd_services", app_name=APP_NAME)
-    enriched = []
-    for svc in services:
-        status = get_service_active_state(svc["name"])
-        enriched.append({**svc, "status": status})
+def list_services():
+    services = list_service_rows()
+    # One batched state lookup for every service instead of one per row
+    states = get_service_active_states([svc["name"] for svc in services])
+    enriched = [{**svc, "status": states[svc["name"]]} for svc in services]
     return {"services": enriched}
\ No newline at end of file
@@ -1,14 +1,97 @@
 # app/systemd_ws.py
 import asyncio
 import subprocess
+import orjson
 from fastapi import WebSocket, WebSocketDisconnect, HTTPException
 from utils.router_logger import get_router_logger
-from .utils import get_service_full_status
+from .utils import get_service_full_status, watch_unit, SERVICE_NAMES
+
+try:
+    from systemd import journal
+except ImportError:  # python-systemd not installed: follow logs via journalctl
+    journal = None
 
 JOURNALCTL = "journalctl"
+JOURNAL_BACKLOG = 10  # lines replayed on connect, like `journalctl -f`
+STATUS_POLL_INTERVAL = 2  # seconds, only used when D-Bus signals are unavailable
+BUS_PROCESS_BATCH = 32  # D-Bus messages dispatched per fd wakeup
 logger = get_router_logger("systemd_ws")
 
 
+def _format_journal_entry(entry: dict) -> str:
+    """Render an entry like journalctl's short-iso output."""
+    timestamp = entry["__REALTIME_TIMESTAMP"].astimezone().isoformat(timespec="seconds")
+    ident = entry.get("SYSLOG_IDENTIFIER") or entry.get("_COMM", "")
+    pid = entry.get("_PID")
+    source = f"{ident}[{pid}]" if pid else ident
+    return f"{timestamp} {entry.get('_HOSTNAME', '')} {source}: {entry.get('MESSAGE', '')}"
+
+
+def _open_journal(service_name: str):
+    """Open a reader on the unit's journal, positioned just before the replayed backlog."""
+    unit = f"{service_name}.service"
+    reader = journal.Reader()
+    # Same filter as `journalctl -u`: the unit's own output, plus what PID 1
+    # and other privileged processes log about it (start/stop/failure lines)
+    reader.add_match(_SYSTEMD_UNIT=unit)
+    reader.add_disjunction()
+    reader.add_match(UNIT=unit, _PID="1")
+    reader.add_disjunction()
+    reader.add_match(OBJECT_SYSTEMD_UNIT=unit, _UID="0")
+    reader.seek_tail()
+    return reader, reader.get_previous(JOURNAL_BACKLOG)
+
+
+async def _follow_journal(websocket: WebSocket, service_name: str):
+    """Send new journal entries for the unit as the journal fd becomes readable."""
+    # Opening and seeking scans journal files; keep that off the event loop
+    reader, first = await asyncio.to_thread(_open_journal, service_name)
+
+    loop = asyncio.get_running_loop()
+    readable = asyncio.Event()
+    fd = reader.fileno()
+    loop.add_reader(fd, readable.set)
+    disconnected = asyncio.ensure_future(_until_disconnect(websocket))
+    try:
+        if first:
+            await websocket.send_text(_format_journal_entry(first))
+        while True:
+            for entry in reader:
+                await websocket.send_text(_format_journal_entry(entry))
+            # A quiet unit may never log again; don't hold the reader for a gone client
+            woken = asyncio.ensure_future(readable.wait())
+            await asyncio.wait({woken, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            woken.cancel()
+            if disconnected.done():
+                raise WebSocketDisconnect()
+            readable.clear()
+            reader.process()
+    finally:
+        disconnected.cancel()
+        loop.remove_reader(fd)
+        reader.close()
+
+
+def _process_bus(watch):
+    """Dispatch the D-Bus messages pending on a readable bus fd, running the signal callbacks."""
+    if watch.closed:
+        return
+    bus = watch.bus
+    # process() always returns a message object; a NULL (empty) one means the
+    # queue is drained
+    for _ in range(BUS_PROCESS_BATCH):
+        if bus.process().is_empty():
+            return
+    # sd-bus may hold already-read messages that won't make the fd readable
+    # again: finish them on a later loop iteration rather than all at once
+    asyncio.get_running_loop().call_soon(_process_bus, watch)
+
+
+async def _until_disconnect(websocket: WebSocket):
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+
+
 def get_service_active_state(service_name: str) -> str:
     """
     Returns the active state of a systemd service using 'systemctl is-active'.
@@ -32,57 +115,99 @@ def get_service_active_state(service_name: str) -> str:
         return "error"
 
 
-def get_service_or_404(service_id: int) -> dict:
+async def get_service_name_or_404(service_id: int) -> str:
+    """Resolve a service id to its unit name, from cache or a DB lookup off the event loop."""
+    service_name = SERVICE_NAMES.get(service_id)
+    if service_name is not None:
+        return service_name
+
     APP_NAME = "systemdManager"
     from crud import get
-    rows = get(
+    rows = await asyncio.to_thread(
+        get,
         table="systemd_services",
+        columns=["name"],
         where="id = %s",
         params=(service_id,),
         app_name=APP_NAME
     )
     if not rows:
         raise HTTPException(status_code=404, detail="Service not found")
-    return rows[0]
+    service_name = SERVICE_NAMES[service_id] = rows[0]["name"]
+    return service_name
+
+
+async def _reject(websocket: WebSocket, service_id: int, e: HTTPException):
+    """Close before accepting, so the client gets an HTTP rejection instead of an open socket."""
+    logger.warning("Service %s access denied: %s %s", service_id, e.status_code, e.detail)
+    close_code = 4404 if e.status_code == 404 else 4403
+    await websocket.close(code=close_code)
 
 
 async def live_service_status(websocket: WebSocket, service_id: int):
+    try:
+        service_name = await get_service_name_or_404(service_id)
+    except HTTPException as e:
+        await _reject(websocket, service_id, e)
+        return
+
     await websocket.accept()
-    service_name = None
+    loop = asyncio.get_running_loop()
+    changed = asyncio.Event()
+    watch = await asyncio.to_thread(watch_unit, service_name, changed.set)
+    if watch is not None:
+        fd = watch.fileno()
+        loop.add_reader(fd, _process_bus, watch)
+    # Subscribed: wake only on PropertiesChanged. Otherwise poll.
+    timeout = None if watch is not None else STATUS_POLL_INTERVAL
+    disconnected = asyncio.ensure_future(_until_disconnect(websocket))
     last_status = None  # Track the last sent status to avoid duplicates
 
     try:
-        service = get_service_or_404(service_id)
-        service_name = service["name"]
-
         while True:
-            current_status = get_service_full_status(service_name)
+            changed.clear()
+            current_status = await asyncio.to_thread(get_service_full_status, service_name)
 
             # Only send if the status has changed
             if current_status != last_status:
-                await websocket.send_json({"status": current_status})
+                await websocket.send_text(orjson.dumps({"status": current_status}).decode())
                 last_status = current_status
 
-            await asyncio.sleep(2)
+            woken = asyncio.ensure_future(changed.wait())
+            await asyncio.wait({woken, disconnected}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            woken.cancel()
+            if disconnected.done():
+                raise WebSocketDisconnect()
 
     except WebSocketDisconnect:
-        logger.info(f"WebSocket disconnected for service {service_name or service_id} status")
-    except HTTPException as e:
-        logger.warning(f"Service {service_id} access denied: {e.status_code} {e.detail}")
-        close_code = 4404 if e.status_code == 404 else 4403
-        await websocket.close(code=close_code)
+        logger.info("WebSocket disconnected for service %s status", service_name)
     except Exception as e:
-        logger.error(f"Error in live status WebSocket for {service_name or service_id}: {e}", exc_info=True)
+        logger.error("Error in live status WebSocket for %s: %s", service_name, e, exc_info=True)
         await websocket.close(code=1011)
+    finally:
+        disconnected.cancel()
+        if watch is not None:
+            loop.remove_reader(fd)
+            # Set here, on the loop thread, so a rescheduled _process_bus can't
+            # touch the bus while another thread closes it
+            watch.closed = True
+            # Unsubscribe is a blocking D-Bus round trip
+            await asyncio.to_thread(watch.close)
 
 
 async def live_service_logs(websocket: WebSocket, service_id: int):
+    try:
+        service_name = await get_service_name_or_404(service_id)
+    except HTTPException as e:
+        await _reject(websocket, service_id, e)
+        return
+
     await websocket.accept()
-    service_name = None
     proc = None
     try:
-        service = get_service_or_404(service_id)
-        service_name = service["name"]
+        if journal is not None:
+            await _follow_journal(websocket, service_name)
+            return
 
         proc = await asyncio.create_subprocess_exec(
             JOURNALCTL,
@@ -106,13 +231,9 @@ async def live_service_logs(websocket: WebSocket, service_id: int):
                 await asyncio.sleep(0.01)
 
     except WebSocketDisconnect:
-        logger.info(f"WebSocket disconnected for service {service_name or service_id} logs")
-    except HTTPException as e:
-        logger.warning(f"Service {service_id} access denied: {e.status_code} {e.detail}")
-        close_code = 4404 if e.status_code == 404 else 4403
-        await websocket.close(code=close_code)
+        logger.info("WebSocket disconnected for service %s logs", service_name)
     except Exception as e:
-        logger.error(f"Error in live logs WebSocket for {service_name or service_id}: {e}", exc_info=True)
+        logger.error("Error in live logs WebSocket for %s: %s", service_name, e, exc_info=True)
     finally:
         if proc and proc.returncode is None:
             proc.terminate()
@@ -1,12 +1,24 @@
 # systemd_utils.py
+import os
+import re
+import shlex
 import subprocess
+import tempfile
+import threading
+import time
 from pathlib import Path
 from fastapi import HTTPException
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Callable, Optional
 
 from utils.router_logger import get_router_logger
 
+try:
+    from pystemd.dbuslib import DBus
+    from pystemd.systemd1 import Manager, Unit
+except ImportError:  # pystemd not installed: everything goes through systemctl
+    DBus = None
+
 # -----------------------
 # Constants
 # -----------------------
@@ -17,6 +29,27 @@ JOURNALCTL = "/usr/bin/journalctl"
 APP_NAME = "systemdManager"
 logger = get_router_logger(APP_NAME)
 
+# "Key=" at the start of a unit file line; comments never match
+_KEY_RE = re.compile(r"^\s*([A-Za-z0-9_]+)\s*=")
+# A newline in a value would inject extra directives into the unit file
+_LINE_BREAK_RE = re.compile(r"[\r\n\x00]")
+
+# `systemctl is-active` results, reused briefly so repeated lookups don't fork
+STATE_CACHE_TTL = 1.5  # seconds
+_STATE_CACHE: dict[str, tuple[float, str]] = {}
+
+# service id -> unit name. Names never change after creation, so only
+# deleting a service has to drop its entry.
+SERVICE_NAMES: dict[int, str] = {}
+
+# One long-lived D-Bus connection to systemd for the process lifetime.
+# sd-bus connections aren't thread-safe, hence the lock.
+_bus = None
+_manager = None
+_units: dict[str, "Unit"] = {}
+_dbus_unavailable = DBus is None
+_bus_lock = threading.Lock()
+
 # -----------------------
 # Schemas
 # -----------------------
@@ -58,27 +91,259 @@ def service_file(name: str) -> Path:
     return SYSTEMD_DIR / f"{name}.service"
 
 
+def write_unit_file(path: Path, content: str) -> None:
+    """
+    Atomically replace a unit file: write a temp file next to it, fsync, rename.
+    systemd never sees a half-written unit, even if we crash mid-write.
+    """
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+# -----------------------
+# D-Bus helpers
+# -----------------------
+def _get_manager():
+    """Return the systemd Manager on the shared bus, or None to fall back to systemctl."""
+    global _bus, _manager, _dbus_unavailable
+    if _manager is None and not _dbus_unavailable:
+        try:
+            bus = DBus()
+            bus.open()
+            manager = Manager(bus=bus)
+            manager.load()
+            _bus, _manager = bus, manager
+        except Exception:
+            logger.warning("systemd D-Bus connection failed, falling back to systemctl", exc_info=True)
+            _dbus_unavailable = True
+    return _manager
+
+
+def _get_unit(name: str):
+    unit = _units.get(name)
+    if unit is None:
+        unit = Unit(f"{name}.service".encode(), bus=_bus)
+        unit.load()
+        _units[name] = unit
+    return unit
+
+
 def reload_systemd():
+    with _bus_lock:
+        manager = _get_manager()
+        if manager is not None:
+            try:
+                manager.Manager.Reload()
+            except Exception as e:
+                raise HTTPException(400, f"daemon-reload failed: {e}")
+            finally:
+                # Reload may change unit object paths; re-resolve them lazily
+                _units.clear()
+            return
     run(["systemctl", "daemon-reload"])
 
 
+class UnitWatch:
+    """
+    A dedicated bus subscribed to one unit's PropertiesChanged signals.
+    Holds the signal callback: pystemd keeps only a borrowed pointer to it,
+    so it must stay referenced until the bus is closed.
+    """
+
+    def __init__(self, bus, manager, callback):
+        self.bus = bus
+        self.manager = manager
+        self.callback = callback
+        self.closed = False
+
+    def fileno(self) -> int:
+        return self.bus.get_fd()
+
+    def close(self) -> None:
+        self.closed = True
+        try:
+            self.manager.Manager.Unsubscribe()
+        except Exception:
+            logger.debug("Unsubscribe failed, closing the bus anyway", exc_info=True)
+        self.bus.close()
+
+
+def watch_unit(name: str, on_change: Callable[[], None]) -> Optional[UnitWatch]:
+    """
+    Open a dedicated bus that calls `on_change()` whenever the unit's properties change.
+    Returns a UnitWatch -- the caller watches its fileno(), calls `watch.bus.process()`
+    when it is readable until `watch.closed` and closes it when done -- or None when
+    D-Bus is unavailable.
+    """
+    if DBus is None or _dbus_unavailable:
+        return None
+    bus = DBus()
+
+    def callback(msg, error=None, userdata=None):
+        on_change()
+
+    watch = None
+    try:
+        bus.open()
+        # systemd only emits unit signals while some client is subscribed
+        manager = Manager(bus=bus)
+        manager.load()
+        manager.Manager.Subscribe()
+        watch = UnitWatch(bus, manager, callback)
+        unit = Unit(f"{name}.service".encode(), bus=bus)
+        unit.load()
+        bus.match_signal(
+            unit.destination,
+            unit.path,
+            b"org.freedesktop.DBus.Properties",
+            b"PropertiesChanged",
+            callback,
+            None,
+        )
+    except Exception:
+        logger.warning("Could not watch %s over D-Bus, falling back to polling", name, exc_info=True)
+        if watch is not None:
+            watch.close()
+        else:
+            bus.close()
+        return None
+    return watch
+
+
+def update_unit_file(content: str, changes: dict[str, dict[str, str]]) -> str:
+    """
+    Set `changes` ({section: {key: value}}) in a unit file's text in one pass.
+    Existing keys are rewritten in place, missing keys are appended to their
+    section (created if needed); comments and repeated keys are left intact.
+    """
+    lines = content.splitlines()
+    out: list[str] = []
+    found: set[tuple[str, str]] = set()
+    section = None
+
+    def add_missing(section_name):
+        missing = [
+            f"{key}={value}"
+            for key, value in changes.get(section_name, {}).items()
+            if (section_name, key) not in found
+        ]
+        if not missing:
+            return
+        # Insert before the blank lines that separate this section from the next
+        insert_at = len(out)
+        while insert_at > 0 and not out[insert_at - 1].strip():
+            insert_at -= 1
+        out[insert_at:insert_at] = missing
+
+    seen_sections = set()
+    for line in lines:
+        stripped = line.strip()
+        if stripped.startswith("[") and stripped.endswith("]"):
+            add_missing(section)
+            section = stripped[1:-1]
+            seen_sections.add(section)
+        elif section in changes and (m := _KEY_RE.match(line)):
+            key = m.group(1)
+            if key in changes[section]:
+                line = f"{key}={changes[section][key]}"
+                found.add((section, key))
+        out.append(line)
+    add_missing(section)
+
+    for section_name, values in changes.items():
+        if section_name not in seen_sections and values:
+            if out and out[-1].strip():
+                out.append("")
+            out.append(f"[{section_name}]")
+            out.extend(f"{key}={value}" for key, value in values.items())
+
+    return "\n".join(out) + ("\n" if content.endswith("\n") else "")
+
+
 def validate_exec_start(cmd: str):
-    if not cmd.startswith("/"):
+    if _LINE_BREAK_RE.search(cmd):
+        raise HTTPException(400, "ExecStart must be a single line")
+    try:
+        argv = shlex.split(cmd)
+    except ValueError as e:
+        raise HTTPException(400, f"Invalid ExecStart: {e}")
+    # Check the executable itself, so a quoted first argument can't slip past
+    if not argv or not argv[0].startswith("/"):
         raise HTTPException(400, "ExecStart must be an absolute path")
 
 
 def get_service_active_state(name: str) -> str:
     """Get the active state of a systemd service (e.g., active, inactive, failed)."""
-    try:
-        result = subprocess.run(
-            [SYSTEMCTL, "is-active", name],
-            capture_output=True,
-            text=True
-        )
-        return result.stdout.strip()
-    except Exception:
-        return "unknown"
-    
+    return get_service_active_states([name])[name]
+
+
+def get_service_active_states(names: list[str]) -> dict[str, str]:
+    """
+    Get the active state of several services.
+    Reads ActiveState over the shared D-Bus connection when available; otherwise
+    makes one `systemctl is-active` call, which prints one state per unit in argument order.
+    """
+    now = time.monotonic()
+    states = {}
+    missing = []
+    for name in names:
+        cached = _STATE_CACHE.get(name)
+        if cached and now - cached[0] < STATE_CACHE_TTL:
+            states[name] = cached[1]
+        else:
+            missing.append(name)
+
+    if missing:
+        with _bus_lock:
+            if _get_manager() is not None:
+                for name in missing:
+                    try:
+                        states[name] = _get_unit(name).Unit.ActiveState.decode()
+                    except Exception:
+                        _units.pop(name, None)
+                        states[name] = "unknown"
+                        continue
+                    _STATE_CACHE[name] = (now, states[name])
+                return states
+
+        try:
+            result = subprocess.run(
+                [SYSTEMCTL, "is-active", *missing],
+                capture_output=True,
+                text=True
+            )
+            lines = result.stdout.splitlines()
+        except Exception:
+            lines = []
+
+        if len(lines) == len(missing):
+            for name, line in zip(missing, lines):
+                states[name] = line.strip()
+                _STATE_CACHE[name] = (now, states[name])
+        else:
+            for name in missing:
+                states[name] = "unknown"
+
+    return states
+
+
+def invalidate_service_state(name: str) -> None:
+    """Drop the cached state after a start/stop/restart so the next read is fresh."""
+    _STATE_CACHE.pop(name, None)
+
+
 def get_service_full_status(service_name: str) -> str:
     """
     Returns the full output of 'systemctl status <service_name>'.
@@ -1,31 +1,18 @@
-from fastapi import APIRouter, HTTPException, Request, Depends
-from utils.router_logger import get_router_logger
+from fastapi import APIRouter, HTTPException, Depends
+from utils.errors import make_router_error_logger
 
 # -----------------------
 # Router setup
 # -----------------------
-router = APIRouter()
 APP_NAME = "portChecker"
 
-logger = get_router_logger(APP_NAME)
-
-# -----------------------
-# Error logging dependency
-# -----------------------
-async def log_router_errors(request: Request):
-    try:
-        yield
-    except Exception as exc:
-        logger.error(
-            f"{request.method} {request.url.path} | {exc}",
-            exc_info=True
-        )
-        raise
+log_router_errors = make_router_error_logger(APP_NAME)
+router = APIRouter(dependencies=[Depends(log_router_errors)])
 
 # -----------------------
 # Routes
 # -----------------------
-@router.get("/status", dependencies=[Depends(log_router_errors)])
+@router.get("/status")
 async def status():
     return {"status": "API running"}
 
@@ -1,19 +1,77 @@
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
+from functools import lru_cache
+from pathlib import Path
 import jwt
 import os
+import secrets
+import time
 
 SECRET_KEY = os.getenv("JWT_SECRET", "supersecret")  # store in .env
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/token")
 
+# Ed25519 keys (PEM files) switch signing to EdDSA: verifiers only need the
+# public key, so no shared secret has to be handed out. Falls back to HS256.
+PRIVATE_KEY_PATH = os.getenv("JWT_PRIVATE_KEY_PATH")
+PUBLIC_KEY_PATH = os.getenv("JWT_PUBLIC_KEY_PATH")
+
+if PRIVATE_KEY_PATH and PUBLIC_KEY_PATH:
+    ALGORITHM = "EdDSA"
+    SIGNING_KEY = Path(PRIVATE_KEY_PATH).read_text()
+    VERIFY_KEY = Path(PUBLIC_KEY_PATH).read_text()
+else:
+    ALGORITHM = "HS256"
+    SIGNING_KEY = VERIFY_KEY = SECRET_KEY
+
+TOKEN_TTL_SECS = int(os.getenv("JWT_TTL_SECS", "3600"))
+LEEWAY_SECS = 5  # tolerated clock skew on exp/iat
+
+# jti of logged-out tokens; in memory, so it only covers this process's lifetime
+_revoked_jtis: set[str] = set()
+
+
 def create_token(user_id: str):
-    payload = {"sub": user_id}
-    token = jwt.encode(payload, SECRET_KEY, algorithm="HS256")
+    now = int(time.time())
+    payload = {
+        "sub": user_id,
+        "iat": now,
+        "exp": now + TOKEN_TTL_SECS,
+        "jti": secrets.token_urlsafe(8),
+    }
+    token = jwt.encode(payload, SIGNING_KEY, algorithm=ALGORITHM)
     return token
 
+
+@lru_cache(maxsize=4096)
+def _decode(token: str) -> dict:
+    """Verify a token once; repeat requests with the same token skip the signature check."""
+    return jwt.decode(
+        token,
+        VERIFY_KEY,
+        algorithms=[ALGORITHM],
+        options={"require": ["exp", "iat", "sub"]},
+        leeway=LEEWAY_SECS,
+    )
+
+
+def revoke_token(token: str) -> None:
+    """Log a token out: reject its jti from now on."""
+    try:
+        jti = _decode(token).get("jti")
+    except jwt.PyJWTError:
+        return
+    if jti:
+        _revoked_jtis.add(jti)
+
+
 def get_current_user(token: str = Depends(oauth2_scheme)):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+        payload = _decode(token)
+        # A cached payload may have expired since it was verified
+        if payload["exp"] + LEEWAY_SECS < time.time():
+            raise jwt.ExpiredSignatureError("Signature has expired")
+        if payload.get("jti") in _revoked_jtis:
+            raise jwt.InvalidTokenError("Token revoked")
         return payload.get("sub")
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
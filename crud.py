@@ -1,42 +1,228 @@
 # crud.py
-from typing import Optional, List, Dict, Any, Tuple, cast
-from db import get_connection, fetch_all, execute
+import threading
+import time
+from functools import lru_cache
+from typing import Optional, List, Dict, Any, Callable, FrozenSet, Iterator, Tuple, cast
+from db import get_connection, release, cursor_for, close_cursor, fetch_all, fetch_iter, execute
+
+# -------------------------------
+# Schema allow-list
+# -------------------------------
+# Table and column names are interpolated into SQL, so only names present in
+# the database's schema are accepted. Each database's schema is read once.
+
+def _name(value) -> str:
+    return value.decode() if isinstance(value, (bytes, bytearray)) else value
+
+
+_schemas: Dict[Optional[str], Dict[str, FrozenSet[str]]] = {}
+
+
+def _schema(app_name: Optional[str], conn=None) -> Dict[str, FrozenSet[str]]:
+    schema = _schemas.get(app_name)
+    if schema is None:
+        # Read on the caller's connection when it has one, so a request never
+        # holds two pooled connections at once
+        rows = fetch_all(
+            "SELECT TABLE_NAME AS table_name, COLUMN_NAME AS column_name "
+            "FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE()",
+            (),
+            app_name,
+            conn=conn,
+        )
+        columns: Dict[str, set] = {}
+        for row in rows:
+            columns.setdefault(_name(row["table_name"]), set()).add(_name(row["column_name"]))
+        schema = _schemas[app_name] = {table: frozenset(cols) for table, cols in columns.items()}
+    return schema
+
+
+def _check_names(app_name: Optional[str], table: str, columns: Tuple[str, ...] = (), conn=None) -> None:
+    """Raise ValueError unless `table` and every name in `columns` exist."""
+    if app_name not in _schemas:
+        _schema(app_name, conn)
+    _check_known_names(app_name, table, columns)
+
+
+@lru_cache(maxsize=1024)
+def _check_known_names(app_name: Optional[str], table: str, columns: Tuple[str, ...]) -> None:
+    # Cached once valid; _check_names has loaded the schema by now
+    schema = _schemas[app_name]
+    if table not in schema:
+        raise ValueError(f"Unknown table: {table}")
+    unknown = set(columns) - schema[table]
+    if unknown:
+        raise ValueError(f"Unknown columns for {table}: {', '.join(sorted(unknown))}")
+
+# -------------------------------
+# SQL builders
+# -------------------------------
+# Statement text depends only on the shape of the call (table, column names,
+# whether there is a WHERE/LIMIT), so each shape is built once and reused.
+# Callers validate names with _check_names first.
+
+@lru_cache(maxsize=1024)
+def _insert_sql(table: str, keys: Tuple[str, ...]) -> str:
+    columns = ", ".join(keys)
+    placeholders = ", ".join(["%s"] * len(keys))
+    return f"INSERT INTO {table} ({columns}) VALUES ({placeholders})"
+
+
+@lru_cache(maxsize=64)
+def _insert_many_sql(table: str, keys: Tuple[str, ...], row_count: int) -> str:
+    columns = ", ".join(keys)
+    group = "(" + ", ".join(["%s"] * len(keys)) + ")"
+    return f"INSERT INTO {table} ({columns}) VALUES " + ", ".join([group] * row_count)
+
+
+@lru_cache(maxsize=1024)
+def _update_sql(table: str, keys: Tuple[str, ...], where: Optional[str]) -> str:
+    set_clause = ", ".join([f"{col} = %s" for col in keys])
+    query = f"UPDATE {table} SET {set_clause}"
+    if where:
+        query += f" WHERE {where}"
+    return query
+
+
+@lru_cache(maxsize=1024)
+def _delete_sql(table: str, where: Optional[str]) -> str:
+    query = f"DELETE FROM {table}"
+    if where:
+        query += f" WHERE {where}"
+    return query
+
+
+@lru_cache(maxsize=1024)
+def _select_sql(table: str, columns: Optional[Tuple[str, ...]], where: Optional[str], limit: Optional[int]) -> str:
+    cols = ", ".join(columns) if columns else "*"
+    query = f"SELECT {cols} FROM {table}"
+    if where:
+        query += f" WHERE {where}"
+    if limit:
+        query += f" LIMIT {limit}"
+    return query
+
+# -------------------------------
+# Read cache
+# -------------------------------
+# Recent get() results keyed by (app, table, query, params). Writes made through
+# this module bump the table's generation, which retires its entries at once.
+
+GET_CACHE_TTL = 5.0  # seconds
+GET_CACHE_SIZE = 4096
+GET_CACHE_MAX_ROWS = 1000  # bigger results aren't worth holding in memory
+_get_cache: Dict[tuple, Tuple[float, int, List[Dict[str, Any]]]] = {}
+_table_generations: Dict[str, int] = {}
+_get_cache_lock = threading.Lock()
+
+
+def _invalidate_table(table: str) -> None:
+    with _get_cache_lock:
+        _table_generations[table] = _table_generations.get(table, 0) + 1
+
+
+def _store_cached(key: tuple, generation: int, rows: List[Dict[str, Any]], now: float) -> None:
+    with _get_cache_lock:
+        if len(_get_cache) >= GET_CACHE_SIZE:
+            for k, (expires, gen, _) in list(_get_cache.items()):
+                if expires <= now or gen != _table_generations.get(k[1], 0):
+                    del _get_cache[k]
+            if len(_get_cache) >= GET_CACHE_SIZE:
+                _get_cache.clear()
+        # Keep private copies so callers can't mutate the cached rows
+        _get_cache[key] = (now + GET_CACHE_TTL, generation, [dict(row) for row in rows])
 
 # -------------------------------
 # CRUD Helper Functions
 # -------------------------------
 
+ADD_MANY_BATCH_SIZE = 1000  # rows per INSERT statement in add_many
+
 def add(
     table: str,
     data: Dict[str, Any],
-    app_name: Optional[str] = None
+    app_name: Optional[str] = None,
+    conn=None,
 ) -> int:
     """
     Insert a row into `table`.
     - data: dict of column:value
     - app_name: optional database name
+    - conn: optional open connection to run on (left open)
     Returns: last inserted id
     """
     if not data:
         raise ValueError("Data dictionary cannot be empty")
 
-    columns = ", ".join(data.keys())
-    placeholders = ", ".join(["%s"] * len(data))
+    keys = tuple(data)
+    _check_names(app_name, table, keys, conn)
+    query = _insert_sql(table, keys)
     values = tuple(data.values())
 
-    query = f"INSERT INTO {table} ({columns}) VALUES ({placeholders})"
-    result = execute(query, values, app_name)
+    result = execute(query, values, app_name, conn=conn)
+    _invalidate_table(table)
     if result is None:
         raise RuntimeError("Insert did not return an id")
     return int(result)
 
 
+def add_many(
+    table: str,
+    rows: List[Dict[str, Any]],
+    app_name: Optional[str] = None,
+    conn=None,
+) -> int:
+    """
+    Insert several rows into `table` with multi-row INSERTs, committed once.
+    - rows: list of dicts, all with the same columns
+    - app_name: optional database name
+    - conn: optional open connection to run on (left open)
+    Returns: number of inserted rows
+    """
+    if not rows:
+        return 0
+
+    keys = tuple(rows[0])
+    if not keys:
+        raise ValueError("Data dictionary cannot be empty")
+    for row in rows:
+        if tuple(row) != keys:
+            raise ValueError("All rows must have the same columns")
+    _check_names(app_name, table, keys, conn)
+
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection(app_name)
+    cursor = conn.cursor()
+    inserted = 0
+    try:
+        # Bounded statements keep each one under max_allowed_packet
+        for start in range(0, len(rows), ADD_MANY_BATCH_SIZE):
+            batch = rows[start:start + ADD_MANY_BATCH_SIZE]
+            values = tuple(value for row in batch for value in row.values())
+            cursor.execute(_insert_many_sql(table, keys, len(batch)), values)
+            inserted += cursor.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        try:
+            cursor.close()
+        finally:
+            if own_conn:
+                release(conn)
+    _invalidate_table(table)
+    return inserted
+
+
 def update(
     table: str,
     data: Dict[str, Any],
     where: Optional[str] = None,
     params: Tuple = (),
-    app_name: Optional[str] = None
+    app_name: Optional[str] = None,
+    conn=None,
 ) -> int:
     """
     Update rows in `table`.
@@ -44,60 +230,69 @@ def update(
     - where: optional SQL WHERE clause (without 'WHERE')
     - params: tuple of values for WHERE placeholders
     - app_name: optional database name
+    - conn: optional open connection to run on (left open)
     Returns: number of affected rows
     """
     if not data:
         raise ValueError("Data dictionary cannot be empty")
 
-    set_clause = ", ".join([f"{col} = %s" for col in data.keys()])
+    keys = tuple(data)
+    _check_names(app_name, table, keys, conn)
+    query = _update_sql(table, keys, where)
     values = tuple(data.values())
-    
-    query = f"UPDATE {table} SET {set_clause}"
     if where:
-        query += f" WHERE {where}"
         values += params
 
-    conn = get_connection(app_name)
-    cursor = conn.cursor()
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection(app_name)
+    cursor = cursor_for(conn, query)
     try:
         cursor.execute(query, values)
         conn.commit()
+        _invalidate_table(table)
         return cursor.rowcount
     finally:
         try:
-            cursor.close()
+            close_cursor(cursor)
         finally:
-            conn.close()
+            if own_conn:
+                release(conn)
 
 
 def delete(
     table: str,
     where: Optional[str] = None,
     params: Tuple = (),
-    app_name: Optional[str] = None
+    app_name: Optional[str] = None,
+    conn=None,
 ) -> int:
     """
     Delete rows from `table`.
     - where: optional SQL WHERE clause
     - params: tuple of values for WHERE placeholders
     - app_name: optional database name
+    - conn: optional open connection to run on (left open)
     Returns: number of affected rows
     """
-    query = f"DELETE FROM {table}"
-    if where:
-        query += f" WHERE {where}"
+    _check_names(app_name, table, conn=conn)
+    query = _delete_sql(table, where)
 
-    conn = get_connection(app_name)
-    cursor = conn.cursor()
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection(app_name)
+    cursor = cursor_for(conn, query)
     try:
         cursor.execute(query, params)
         conn.commit()
+        _invalidate_table(table)
         return cursor.rowcount
     finally:
         try:
-            cursor.close()
+            close_cursor(cursor)
         finally:
-            conn.close()
+            if own_conn:
+                release(conn)
 
 
 def get(
@@ -107,6 +302,7 @@ def get(
     params: Tuple = (),
     app_name: Optional[str] = None,
     limit: Optional[int] = None,
+    conn=None,
 ) -> List[Dict[str, Any]]:
     """
     Fetch rows from `table`.
@@ -115,13 +311,110 @@ def get(
     - params: tuple of values for WHERE placeholders
     - limit: optional limit of rows
     - app_name: optional database name
+    - conn: optional open connection to run on (left open)
     Returns: list of dictionaries
+    Results are served from a short TTL cache until a write to `table`.
     """
-    cols = ", ".join(columns) if columns else "*"
-    query = f"SELECT {cols} FROM {table}"
-    if where:
-        query += f" WHERE {where}"
-    if limit:
-        query += f" LIMIT {limit}"
+    cols = tuple(columns) if columns else None
+    _check_names(app_name, table, cols or (), conn)
+    query = _select_sql(table, cols, where, limit)
+
+    return _cached_fetch(table, query, params, app_name, conn)
+
+
+def _cached_fetch(table: str, query: str, params: Tuple, app_name: Optional[str], conn) -> List[Dict[str, Any]]:
+    key: Optional[tuple] = (app_name, table, query, tuple(params))
+    now = time.monotonic()
+    with _get_cache_lock:
+        generation = _table_generations.get(table, 0)
+        try:
+            cached = _get_cache.get(key)
+        except TypeError:  # unhashable params: skip the cache
+            key = cached = None
+        if cached and cached[0] > now and cached[1] == generation:
+            return [dict(row) for row in cached[2]]
+
+    rows = cast(List[Dict[str, Any]], fetch_all(query, params, app_name, conn=conn))
+    if key is not None and len(rows) < GET_CACHE_MAX_ROWS:
+        _store_cached(key, generation, rows, now)
+    return rows
+
+
+def get_iter(
+    table: str,
+    columns: Optional[List[str]] = None,
+    where: Optional[str] = None,
+    params: Tuple = (),
+    app_name: Optional[str] = None,
+    limit: Optional[int] = None,
+    chunk: int = 500,
+    conn=None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Like `get`, but yields rows as they arrive instead of building a list.
+    - chunk: rows fetched from the server per round
+    Bypasses the read cache; meant for results too large to hold in memory.
+    """
+    cols = tuple(columns) if columns else None
+    _check_names(app_name, table, cols or (), conn)
+    query = _select_sql(table, cols, where, limit)
+
+    return fetch_iter(query, params, app_name, chunk=chunk, conn=conn)
+
+
+# -------------------------------
+# Prebuilt statements
+# -------------------------------
+# For call sites that always run the same statement: the SQL is built once when
+# the router module is imported, and names are checked on the first call.
+
+def make_getter(
+    table: str,
+    columns: Optional[List[str]] = None,
+    where: Optional[str] = None,
+    app_name: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> Callable[..., List[Dict[str, Any]]]:
+    """
+    Return `getter(params=(), conn=None)`, equivalent to
+    get(table, columns, where, params, app_name, limit, conn).
+    """
+    cols = tuple(columns) if columns else None
+    query = _select_sql(table, cols, where, limit)
+    checked = False
+
+    def getter(params: Tuple = (), conn=None) -> List[Dict[str, Any]]:
+        nonlocal checked
+        if not checked:
+            _check_names(app_name, table, cols or (), conn)
+            checked = True
+        return _cached_fetch(table, query, params, app_name, conn)
+
+    return getter
+
+
+def make_inserter(
+    table: str,
+    columns: List[str],
+    app_name: Optional[str] = None,
+) -> Callable[..., int]:
+    """
+    Return `inserter(data, conn=None)`, equivalent to add(table, data, app_name, conn)
+    for a `data` dict holding exactly `columns`. Returns the last inserted id.
+    """
+    keys = tuple(columns)
+    query = _insert_sql(table, keys)
+    checked = False
+
+    def inserter(data: Dict[str, Any], conn=None) -> int:
+        nonlocal checked
+        if not checked:
+            _check_names(app_name, table, keys, conn)
+            checked = True
+        result = execute(query, tuple(data[key] for key in keys), app_name, conn=conn)
+        _invalidate_table(table)
+        if result is None:
+            raise RuntimeError("Insert did not return an id")
+        return int(result)
 
-    return cast(List[Dict[str, Any]], fetch_all(query, params, app_name))
+    return inserter
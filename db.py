@@ -1,55 +1,214 @@
 import mysql.connector
 import os
+import threading
+from collections import OrderedDict
 from dotenv import load_dotenv
-from typing import Optional
+from mysql.connector import pooling
+from typing import Dict, Optional
 
 load_dotenv()
 
 HOST = os.getenv("DB_SERVER", "localhost")
 USER = os.getenv("DB_USER", "root")
 PASSWORD = os.getenv("DB_PASSWORD", "")
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "16"))
+# How long a request waits for a free pooled connection before failing
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Compressed protocol trades CPU for bandwidth; worth it only for a remote DB
+COMPRESS = os.getenv("DB_COMPRESS", "").lower() in ("1", "true", "yes")
+# Server-side prepared statements, kept per connection and reused across
+# requests. mysql.connector sends COM_STMT_RESET before every execute, so this
+# trades a round trip for server parse/plan time; enable where that pays off.
+PREPARED_STATEMENTS = os.getenv("DB_PREPARED_STATEMENTS", "").lower() in ("1", "true", "yes")
+PREPARED_CACHE_SIZE = 64  # statements per connection
 
+# One pool per database; close() on a pooled connection hands it back
+_pools: Dict[Optional[str], pooling.MySQLConnectionPool] = {}
+_pools_lock = threading.Lock()
+# pool_name -> free slots; checkouts beyond POOL_SIZE wait here instead of
+# opening extra connections the server's max_connections may not allow
+_pool_slots: Dict[str, threading.BoundedSemaphore] = {}
 
-def get_connection(app_name: Optional[str] = None):
-    """
-    Create and return a MySQL connection.
-    If `app_name` is provided it will be used as the database name;
-    otherwise no `database` parameter is passed (uses server default).
-    """
+
+def _connect_kwargs(app_name: Optional[str]) -> dict:
     connect_kwargs = {
         "host": HOST,
         "user": USER,
         "password": PASSWORD,
+        # Decode rows in the bundled C extension (_mysql_connector) rather than
+        # pure Python; only fall back when the wheel was built without it
+        "use_pure": not mysql.connector.HAVE_CEXT,
+        # Drain unread rows automatically so a pooled connection is never
+        # handed back with a pending result set
+        "consume_results": True,
+        "compress": COMPRESS,
     }
     if app_name:
         connect_kwargs["database"] = app_name
+    return connect_kwargs
+
+
+def _get_pool(app_name: Optional[str]) -> pooling.MySQLConnectionPool:
+    pool = _pools.get(app_name)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(app_name)
+            if pool is None:
+                pool_name = f"app_{app_name or 'default'}"
+                _pool_slots[pool_name] = threading.BoundedSemaphore(POOL_SIZE)
+                pool = _pools[app_name] = pooling.MySQLConnectionPool(
+                    pool_name=pool_name,
+                    pool_size=POOL_SIZE,
+                    # COM_RESET_CONNECTION would drop prepared statements;
+                    # release() rolls back instead when they are in use
+                    pool_reset_session=not PREPARED_STATEMENTS,
+                    **_connect_kwargs(app_name),
+                )
+    return pool
+
+
+def get_connection(app_name: Optional[str] = None):
+    """
+    Return a MySQL connection from the pool for `app_name`.
+    If `app_name` is provided it will be used as the database name;
+    otherwise no `database` parameter is passed (uses server default).
+    When every pooled connection is in use, waits up to POOL_TIMEOUT seconds
+    for one to be released, then raises PoolError.
+    """
+    pool = _get_pool(app_name)
+    slots = _pool_slots[pool.pool_name]
+    if not slots.acquire(timeout=POOL_TIMEOUT):
+        raise pooling.PoolError(f"No free connection in {pool.pool_name} after {POOL_TIMEOUT}s")
+    try:
+        return pool.get_connection()
+    except BaseException:
+        slots.release()
+        raise
+
+
+def release(conn) -> None:
+    """Hand a connection back to its pool, freeing its slot for the next get_connection()."""
+    try:
+        if PREPARED_STATEMENTS:
+            # No session reset on return, so end any open read snapshot here
+            try:
+                conn.rollback()
+            except mysql.connector.Error:
+                pass
+        conn.close()
+    finally:
+        _pool_slots[conn.pool_name].release()
+
+
+def _prepared_cursor(conn, query):
+    # Cache on the physical connection; a pooled wrapper is new per checkout
+    cnx = getattr(conn, "_cnx", None) or conn
+    cache = getattr(cnx, "_prep_cache", None)
+    if cache is None or cache[0] != cnx.connection_id:
+        # First use, or the pool reconnected and the server dropped our statements
+        cache = cnx._prep_cache = (cnx.connection_id, OrderedDict())
+    statements = cache[1]
+    cursor = statements.get(query)
+    if cursor is None:
+        cursor = statements[query] = cnx.cursor(prepared=True)
+        if len(statements) > PREPARED_CACHE_SIZE:
+            _, evicted = statements.popitem(last=False)
+            evicted.close()
+    else:
+        statements.move_to_end(query)
+    return cursor
+
 
-    return mysql.connector.connect(**connect_kwargs)
+def cursor_for(conn, query):
+    """
+    Return a cursor to run `query` on. With prepared statements enabled this is
+    the connection's cached prepared cursor for `query`; close it with close_cursor().
+    """
+    if PREPARED_STATEMENTS:
+        return _prepared_cursor(conn, query)
+    return conn.cursor()
+
+
+def close_cursor(cursor) -> None:
+    # Cached prepared cursors stay open for the next execute of their statement
+    if not PREPARED_STATEMENTS:
+        cursor.close()
+
+
+def make_db_conn(app_name: Optional[str] = None):
+    """
+    Build a FastAPI dependency that yields one pooled connection for the request,
+    so handlers making several CRUD calls share it (pass it as `conn=`).
+    """
+    def db_conn():
+        conn = get_connection(app_name)
+        try:
+            yield conn
+        finally:
+            release(conn)
+
+    return db_conn
 
 
-def fetch_all(query, params=(), app_name: Optional[str] = None):
-    conn = get_connection(app_name)
-    cursor = conn.cursor(dictionary=True)
+def fetch_all(query, params=(), app_name: Optional[str] = None, conn=None):
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection(app_name)
+    cursor = cursor_for(conn, query)
     try:
         cursor.execute(query, params)
-        rows = cursor.fetchall()
-        return rows
+        # Plain tuple rows, zipped with the column names once per result
+        # instead of the dictionary cursor's per-row conversion
+        keys = tuple(d[0] for d in cursor.description)
+        return [dict(zip(keys, row)) for row in cursor.fetchall()]
     finally:
         try:
-            cursor.close()
+            close_cursor(cursor)
         finally:
-            conn.close()
+            if own_conn:
+                release(conn)
 
 
-def execute(query, params=(), app_name: Optional[str] = None):
-    conn = get_connection(app_name)
+def fetch_iter(query, params=(), app_name: Optional[str] = None, chunk: int = 500, conn=None):
+    """
+    Yield rows as dicts, pulling `chunk` rows at a time from an unbuffered cursor,
+    so memory stays flat however large the result is. The cursor (and the
+    connection, unless one was passed in) is released when the generator is
+    exhausted or closed.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection(app_name)
     cursor = conn.cursor()
+    try:
+        cursor.execute(query, params)
+        keys = tuple(d[0] for d in cursor.description)
+        while True:
+            rows = cursor.fetchmany(chunk)
+            if not rows:
+                break
+            for row in rows:
+                yield dict(zip(keys, row))
+    finally:
+        try:
+            cursor.close()
+        finally:
+            if own_conn:
+                release(conn)
+
+
+def execute(query, params=(), app_name: Optional[str] = None, conn=None):
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection(app_name)
+    cursor = cursor_for(conn, query)
     try:
         cursor.execute(query, params)
         conn.commit()
         return cursor.lastrowid
     finally:
         try:
-            cursor.close()
+            close_cursor(cursor)
         finally:
-            conn.close()
+            if own_conn:
+                release(conn)
@@ -1,20 +1,27 @@
+import importlib
+import os
+from anyio import to_thread
 from fastapi import FastAPI, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
-# Import routers
-from app.server_manager.port_manager.port_manager_crud import router as portManager_router
-from app.server_manager.server_management_user import router as ServerManagementUser_router
-from app.shared import router as shared_router
-from app.server_manager.systemd.systemd import router as systemd_router
-from app.server_manager.file_manager.router import router as filemanager_router  # ✅ NEW ROUTER
-from app.server_manager.file_manager.allowed_roots_router import router as allowed_roots_router  # ✅ NEW WS HANDLER
+# Routers are imported on startup, not at module import: each one pulls in
+# mysql-connector, psutil, pystemd, ... which importing main shouldn't pay for.
+# (module, attribute, prefix, tag)
+_ROUTERS = [
+    ("app.server_manager.port_manager.port_manager_crud", "router", "/api/portManager", "PortManager"),
+    ("app.server_manager.server_management_user", "router", "/api/ServerManagerUser", "ServerManagerUser"),
+    ("app.shared", "router", "/api/shared", "Shared"),
+    ("app.server_manager.systemd.systemd", "router", "/api/systemd", "Systemd"),
+    ("app.server_manager.file_manager.router", "router", "/api/filemanager", "Filemanager"),
+    ("app.server_manager.file_manager.allowed_roots_router", "router", "/api/allowed_route", "allowed_route"),
+]
 
-# Import WebSocket handlers
-from app.server_manager import hardware_ws
-from app.server_manager.systemd.systemd_ws import live_service_status, live_service_logs
+# Sync (DB-bound) route handlers run in AnyIO's worker threads; its default
+# of 40 caps how many requests can be in flight at once
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", "128"))
 
-
-app = FastAPI(title="Multi-App API")
+app = FastAPI(title="Multi-App API", default_response_class=ORJSONResponse)
 
 # CORS middleware
 app.add_middleware(
@@ -26,40 +33,63 @@ app.add_middleware(
 )
 
 # REST API routers
-app.include_router(portManager_router, prefix="/api/portManager", tags=["PortManager"])
-app.include_router(ServerManagementUser_router, prefix="/api/ServerManagerUser", tags=["ServerManagerUser"])
-app.include_router(shared_router, prefix="/api/shared", tags=["Shared"])
-app.include_router(systemd_router, prefix="/api/systemd", tags=["Systemd"])
-app.include_router(filemanager_router, prefix="/api/filemanager", tags=["Filemanager"])
-app.include_router(allowed_roots_router, prefix="/api/allowed_route", tags=["allowed_route"])
+def register_routes(app: FastAPI):
+    for module_name, attr, prefix, tag in _ROUTERS:
+        module = importlib.import_module(module_name)
+        app.include_router(getattr(module, attr), prefix=prefix, tags=[tag])
 
 # Hardware WebSocket endpoints
 @app.websocket("/hardware/cpu")
 async def cpu_ws(websocket: WebSocket):
+    from app.server_manager import hardware_ws
     await hardware_ws.websocket_endpoint(websocket, "cpu")
 
 @app.websocket("/hardware/memory")
 async def memory_ws(websocket: WebSocket):
+    from app.server_manager import hardware_ws
     await hardware_ws.websocket_endpoint(websocket, "memory")
 
 @app.websocket("/hardware/disk")
 async def disk_ws(websocket: WebSocket):
+    from app.server_manager import hardware_ws
     await hardware_ws.websocket_endpoint(websocket, "disk")
 
 @app.websocket("/hardware/network")
 async def network_ws(websocket: WebSocket):
+    from app.server_manager import hardware_ws
     await hardware_ws.websocket_endpoint(websocket, "network")
 
 # Systemd WebSocket endpoints
 @app.websocket("/systemd/services/{service_id}/status/live")
 async def systemd_status_ws(websocket: WebSocket, service_id: int):
+    from app.server_manager.systemd.systemd_ws import live_service_status
     await live_service_status(websocket, service_id)
 
 @app.websocket("/systemd/services/{service_id}/logs/live")
 async def systemd_logs_ws(websocket: WebSocket, service_id: int):
+    from app.server_manager.systemd.systemd_ws import live_service_logs
     await live_service_logs(websocket, service_id)
 
 # Startup event
 @app.on_event("startup")
 async def startup_event():
-    hardware_ws.start_broadcasts()
\ No newline at end of file
+    from app.server_manager import hardware_ws
+
+    register_routes(app)
+    to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    hardware_ws.start_broadcasts()
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(
+        "main:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", "8000")),
+        loop="uvloop",
+        http="httptools",
+        ws="websockets",
+        # Metric frames are small and already compact; deflate only costs CPU
+        ws_per_message_deflate=False,
+        timeout_keep_alive=30,
+    )
@@ -0,0 +1,24 @@
+# utils/errors.py
+
+from fastapi import Request
+from utils.router_logger import get_router_logger
+
+
+# -----------------------
+# Error logging dependency
+# -----------------------
+def make_router_error_logger(app_name: str):
+    """
+    Build the error-logging dependency for a router.
+    Attach it once with APIRouter(dependencies=[Depends(...)]) instead of per route.
+    """
+    logger = get_router_logger(app_name)
+
+    async def log_router_errors(request: Request):
+        try:
+            yield
+        except Exception as exc:
+            logger.error("%s %s | %s", request.method, request.url.path, exc, exc_info=True)
+            raise
+
+    return log_router_errors
@@ -1,25 +1,65 @@
 # utils/router_logger.py
 
+import atexit
 import logging
+import queue
+import sys
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
 from typing import Optional
 from fastapi import Request, WebSocket
 
 # -----------------------
-# Base logger configuration
+# Background log writer
 # -----------------------
-def configure_logger(name: Optional[str] = None):
-    logger = logging.getLogger(name or "router_logger")
-    logger.setLevel(logging.INFO)
+# Loggers only enqueue records; a listener thread does the actual stream I/O
+# so logging never blocks the event loop.
+_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+_listener: Optional[QueueListener] = None
 
-    # Prevent adding multiple handlers if logger is reused
-    if not logger.handlers:
-        ch = logging.StreamHandler()
+APP_LOGGER_NAME = "app"
+DEFAULT_APP = "router_logger"
+
+
+class _AppFieldFilter(logging.Filter):
+    """Give records logged without an adapter the default `app` field."""
+
+    def filter(self, record):
+        if not hasattr(record, "app"):
+            record.app = DEFAULT_APP
+        return True
+
+
+def _get_queue_handler() -> QueueHandler:
+    global _listener
+    if _listener is None:
+        ch = logging.StreamHandler(sys.stderr)
         ch.setLevel(logging.INFO)
         formatter = logging.Formatter(
-            "%(asctime)s - %(levelname)s - %(message)s"
+            "%(asctime)s - %(levelname)s - [%(app)s] %(message)s",
+            datefmt="%Y-%m-%d %H:%M:%S",
         )
         ch.setFormatter(formatter)
-        logger.addHandler(ch)
+        _listener = QueueListener(_log_queue, ch, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+    handler = QueueHandler(_log_queue)
+    handler.addFilter(_AppFieldFilter())
+    return handler
+
+
+# -----------------------
+# Base logger configuration
+# -----------------------
+def configure_logger() -> logging.Logger:
+    """The single `app` logger every router logs through; handlers are attached once."""
+    logger = logging.getLogger(APP_LOGGER_NAME)
+    logger.setLevel(logging.INFO)
+
+    # Prevent adding multiple handlers if logger is reused
+    if not logger.handlers:
+        logger.addHandler(_get_queue_handler())
 
     return logger
 
@@ -27,8 +67,19 @@ def configure_logger(name: Optional[str] = None):
 # -----------------------
 # Public function
 # -----------------------
-def get_router_logger(name: Optional[str] = None):
-    return configure_logger(name)
+@lru_cache(maxsize=None)
+def _named_logger(name: str) -> logging.LoggerAdapter:
+    return logging.LoggerAdapter(configure_logger(), {"app": name})
+
+
+def get_router_logger(name: Optional[str] = None) -> logging.LoggerAdapter:
+    """Return a view of the `app` logger that tags each record with `name`."""
+    if name is None:
+        return _LOGGER
+    return _named_logger(name)
+
+
+_LOGGER = _named_logger(DEFAULT_APP)
 
 
 # -----------------------
@@ -38,28 +89,35 @@ def log_request(request: Request):
     """
     Log a standard HTTP request
     """
+    if not _LOGGER.isEnabledFor(logging.INFO):
+        return
     client_host = request.client.host if request.client else "unknown"
     method = request.method
     url = request.url.path
-    logger = get_router_logger()
-    logger.info(f"[HTTP] {method} {url} from {client_host}")
+    _LOGGER.info("[HTTP] %s %s from %s", method, url, client_host)
 
 
 async def log_ws_connection(websocket: WebSocket):
     """
     Log a websocket connection
     """
+    if not _LOGGER.isEnabledFor(logging.INFO):
+        return
     client_host = websocket.client.host if websocket.client else "unknown"
     path = websocket.url.path
-    logger = get_router_logger()
-    logger.info(f"[WS] Client connected to {path} from {client_host}")
+    # Remembered so the disconnect log doesn't rebuild the URL
+    websocket.state.log_ctx = (path, client_host)
+    _LOGGER.info("[WS] Client connected to %s from %s", path, client_host)
 
 
 async def log_ws_disconnection(websocket: WebSocket):
     """
     Log a websocket disconnection
     """
-    client_host = websocket.client.host if websocket.client else "unknown"
-    path = websocket.url.path
-    logger = get_router_logger()
-    logger.info(f"[WS] Client disconnected from {path} ({client_host})")
+    if not _LOGGER.isEnabledFor(logging.INFO):
+        return
+    log_ctx = getattr(websocket.state, "log_ctx", None)
+    if log_ctx is None:
+        client_host = websocket.client.host if websocket.client else "unknown"
+        log_ctx = (websocket.url.path, client_host)
+    _LOGGER.info("[WS] Client disconnected from %s (%s)", *log_ctx)